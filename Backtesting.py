@@ -2,47 +2,69 @@ import backtrader as bt
 from datetime import datetime
 import yfinance as yf  # For data download
 
-def run_orb_backtest():
-    """Complete backtesting setup with optimization"""
+# Defaults, overridden by the [backtest] / [optimize] sections of the CLI config
+SYMBOLS = ['AAPL', 'GOOGL', 'MSFT', 'TSLA', 'AMZN', 'NVDA', 'META']
+
+PORTFOLIO_PARAMS = dict(
+    num_opening_bars=3,
+    max_positions=5,
+    volume_threshold=1.5,
+    ma_period=50,
+    use_ma_filter=True
+)
+
+OPTIMIZATION_GRID = dict(
+    num_opening_bars=range(2, 6),          # Test 2-5 bars
+    volume_threshold=[1.2, 1.5, 2.0],     # Volume thresholds
+    stop_atr_multiple=[1.5, 2.0, 2.5],    # Stop distances
+    profit_atr_multiple=[2.0, 3.0, 4.0]   # Profit targets
+)
+
+def make_data_feed(df):
+    """Backtrader data feed for a yfinance OHLCV DataFrame"""
+    return bt.feeds.PandasData(
+        dataname=df,
+        datetime=None,
+        open=0,
+        high=1,
+        low=2,
+        close=3,
+        volume=4,
+        openinterest=-1
+    )
+
+def run_orb_backtest(symbols=None, start='2020-01-01', end='2024-01-01',
+                     cash=100000.0, commission=0.001, strategy_params=None, event_log=None):
+    """Complete backtesting setup with optimization
+    
+    event_log: optional path of an Event_Log file to record signals, orders
+    and fills to (appended to if it exists), see Trading_CLI.py events.
+    """
     cerebro = bt.Cerebro()
     
     # Import the strategy from the other file
     from Core_Strategy_Structure import PortfolioORBStrategy
     
     # Add strategy
-    cerebro.addstrategy(
-        PortfolioORBStrategy,
-        num_opening_bars=3,
-        max_positions=5,
-        volume_threshold=1.5,
-        ma_period=50,
-        use_ma_filter=True
-    )
+    params = dict(PORTFOLIO_PARAMS)
+    params.update(strategy_params or {})
+    recorder = None
+    if event_log:
+        from Event_Log import EventRecorder
+        recorder = params['recorder'] = EventRecorder(event_log)
+    cerebro.addstrategy(PortfolioORBStrategy, **params)
     
     # Add multiple data feeds
-    symbols = ['AAPL', 'GOOGL', 'MSFT', 'TSLA', 'AMZN', 'NVDA', 'META']
-    
-    for symbol in symbols:
+    for symbol in symbols or SYMBOLS:
         # Download data using yfinance instead of YahooFinanceData
-        df = yf.download(symbol, start='2020-01-01', end='2024-01-01', interval='1d')
+        df = yf.download(symbol, start=start, end=end, interval='1d')
         
         # Create a backtrader data feed
-        data = bt.feeds.PandasData(
-            dataname=df,
-            datetime=None,
-            open=0,
-            high=1,
-            low=2,
-            close=3,
-            volume=4,
-            openinterest=-1
-        )
-        
-        cerebro.adddata(data, name=symbol)
+        cerebro.adddata(make_data_feed(df), name=symbol)
     
     # Broker settings
-    cerebro.broker.setcash(100000.0)
-    cerebro.broker.setcommission(commission=0.001)  # 0.1% commission
+    cerebro.broker.setcash(cash)
+    cerebro.broker.setcommission(commission=commission)  # 0.1% commission by default
     
     # Add analyzers
     cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
@@ -53,7 +75,12 @@ def run_orb_backtest():
     
     # Run backtest
     print('Starting Portfolio Value: %.2f' % cerebro.broker.getvalue())
-    results = cerebro.run()
+    try:
+        results = cerebro.run()
+    finally:
+        if recorder:
+            recorder.close()
+            print(f"Events recorded to '{event_log}'")
     print('Final Portfolio Value: %.2f' % cerebro.broker.getvalue())
     
     # Extract performance metrics
@@ -90,43 +117,40 @@ def run_orb_backtest():
     return results
 
 # Parameter optimization function
-def optimize_orb_parameters():
-    """Optimize ORB strategy parameters"""
+def optimize_orb_parameters(symbol='SPY', start='2020-01-01', end='2023-01-01',
+                            cash=100000.0, maxcpus=4, param_grid=None, intrabar=None):
+    """Optimize ORB strategy parameters
+    
+    intrabar: optional [optimize.intrabar] settings (see
+    Intrabar_Resolution.resolver_from_settings) to classify daily bars that
+    hit both the stop and the target from finer bars in the bar store. Exits
+    still fill at the next open, so this only changes the exit counts.
+    """
     cerebro = bt.Cerebro(optreturn=False)
     
     from Core_Strategy_Structure import OpeningRangeBreakout
     
-    # Download SPY data
-    df = yf.download('SPY', start='2020-01-01', end='2023-01-01', interval='1d')
+    # Download data for the optimization symbol (SPY by default)
+    df = yf.download(symbol, start=start, end=end, interval='1d')
     
     # Add data
-    data = bt.feeds.PandasData(
-        dataname=df,
-        datetime=None,
-        open=0,
-        high=1,
-        low=2,
-        close=3,
-        volume=4,
-        openinterest=-1
-    )
-    cerebro.adddata(data)
+    cerebro.adddata(make_data_feed(df))
     
     # Optimization strategy
-    cerebro.optstrategy(
-        OpeningRangeBreakout,
-        num_opening_bars=range(2, 6),          # Test 2-5 bars
-        volume_threshold=[1.2, 1.5, 2.0],     # Volume thresholds
-        stop_atr_multiple=[1.5, 2.0, 2.5],    # Stop distances
-        profit_atr_multiple=[2.0, 3.0, 4.0]   # Profit targets
-    )
-    
-    cerebro.broker.setcash(100000.0)
+    grid = dict(OPTIMIZATION_GRID)
+    grid.update(param_grid or {})
+    if intrabar:
+        from Intrabar_Resolution import resolver_from_settings
+        # Same resolver for every combination, not a parameter to optimize
+        grid['intrabar_resolver'] = (resolver_from_settings(intrabar, symbol),)
+    cerebro.optstrategy(OpeningRangeBreakout, **grid)
+    
+    cerebro.broker.setcash(cash)
     cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
     cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
     
     # Run optimization
-    results = cerebro.run(maxcpus=4)
+    results = cerebro.run(maxcpus=maxcpus)
     
     # Process results
     optimization_results = []
@@ -141,22 +165,31 @@ def optimize_orb_parameters():
             'stop_multiple': strat.params.stop_atr_multiple,
             'profit_multiple': strat.params.profit_atr_multiple,
             'sharpe_ratio': sharpe,
-            'total_return': returns
+            'total_return': returns,
+            **{f'{reason}_exits': count for reason, count in strat.exit_counts().items()}
         })
     
-    # Sort by Sharpe ratio
-    optimization_results.sort(key=lambda x: x['sharpe_ratio'], reverse=True)
+    print_top_combinations(optimization_results)
+    
+    return optimization_results
+
+def print_top_combinations(optimization_results, top=5):
+    """Sort optimization results by Sharpe ratio and print the best ones"""
+    # Sort by Sharpe ratio (None when the analyzer had too little data)
+    optimization_results.sort(key=lambda x: x['sharpe_ratio'] or 0, reverse=True)
     
-    print("\n=== TOP 5 PARAMETER COMBINATIONS ===")
-    for i, result in enumerate(optimization_results[:5], 1):
+    print(f"\n=== TOP {top} PARAMETER COMBINATIONS ===")
+    for i, result in enumerate(optimization_results[:top], 1):
         print(f"{i}. Opening Bars: {result['opening_bars']}, "
               f"Volume: {result['volume_threshold']}, "
               f"Stop: {result['stop_multiple']}, "
               f"Target: {result['profit_multiple']}")
-        print(f"   Sharpe: {result['sharpe_ratio']:.2f}, "
-              f"Return: {result['total_return']:.2%}\n")
-    
-    return optimization_results
+        print(f"   Sharpe: {result['sharpe_ratio'] or 0:.2f}, "
+              f"Return: {result['total_return']:.2%}")
+        if 'stop_exits' in result:
+            print(f"   Exits: {result['stop_exits']} stop, {result['target_exits']} target, "
+                  f"{result['ambiguous_exits']} ambiguous")
+        print()
 
 # Usage example
 if __name__ == "__main__":
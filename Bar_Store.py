@@ -0,0 +1,224 @@
+import os
+import re
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Layout of the store:
+#   {root}/{ticker}/{timeframe}/{YYYY-MM}/part-{first_ts}-{last_ts}.parquet
+# Every fetched page is appended as its own part file inside the month
+# partition of its bars. Timestamps are Unix milliseconds (Polygon's 't').
+PART_PATTERN = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+# Merge a month partition into a single file once it holds this many parts.
+MAX_PARTS_PER_PARTITION = 32
+# Rows per Parquet row group. Small groups let range reads skip most of a
+# compacted month partition using the row group statistics.
+ROW_GROUP_SIZE = 4096
+
+
+def ticker_folder_name(ticker: str) -> str:
+    """Filesystem-safe folder name for a ticker, e.g. 'X:BTCUSD' -> 'X_BTCUSD'."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+
+
+def series_folder(root: str, ticker: str, timeframe: str) -> str:
+    """Folder holding all month partitions of one ticker/timeframe series."""
+    return os.path.join(root, ticker_folder_name(ticker), timeframe)
+
+
+def month_of(timestamp_ms: int) -> str:
+    """Month partition name ('YYYY-MM', UTC) of a millisecond timestamp."""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def list_partitions(root: str, ticker: str, timeframe: str) -> list[str]:
+    """Sorted month partition names of a series, empty if the series doesn't exist."""
+    folder = series_folder(root, ticker, timeframe)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder) if MONTH_PATTERN.match(name))
+
+
+def list_parts(partition_path: str) -> list[tuple[int, int, str]]:
+    """
+    Lists the part files of a month partition.
+
+    Returns:
+        A list of (first_ts, last_ts, filename) tuples sorted by first
+        timestamp, i.e. in the order they have to be read.
+    """
+    parts = []
+    if not os.path.isdir(partition_path):
+        return parts
+    for filename in os.listdir(partition_path):
+        match = PART_PATTERN.match(filename)
+        if match:
+            parts.append((int(match.group(1)), int(match.group(2)), filename))
+    parts.sort()
+    return parts
+
+
+def latest_timestamp(root: str, ticker: str, timeframe: str) -> int | None:
+    """
+    Returns the millisecond timestamp of the newest stored bar of a series.
+
+    Only file names are inspected, so resuming a download doesn't read any data.
+    """
+    for month in reversed(list_partitions(root, ticker, timeframe)):
+        parts = list_parts(os.path.join(series_folder(root, ticker, timeframe), month))
+        if parts:
+            return max(last_ts for _, last_ts, _ in parts)
+    return None
+
+
+def _fsync_folder(folder: str) -> None:
+    """Persists a rename in folder (not supported on Windows, where it's a no-op)."""
+    if os.name == "nt":
+        return
+    fd = os.open(folder or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_parquet(df: pd.DataFrame, filepath: str) -> None:
+    """
+    Writes a DataFrame to a Parquet file via a temp file and an atomic rename,
+    so an interrupted write never leaves a truncated file behind.
+
+    The data is fsynced before the rename, otherwise a power loss could keep
+    the rename but not the data and leave an empty part file.
+    """
+    folder = os.path.dirname(filepath)
+    tmp_filepath = os.path.join(folder, f".{os.path.basename(filepath)}.tmp")
+    try:
+        with open(tmp_filepath, "wb") as f:
+            df.to_parquet(f, index=False, row_group_size=ROW_GROUP_SIZE)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filepath, filepath)
+        _fsync_folder(folder)
+    finally:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+
+
+def append_bars(root: str, ticker: str, timeframe: str, records: list[dict]) -> int:
+    """
+    Appends raw API bar records (dicts with a 't' key) to the store.
+
+    The records are split by month and each month chunk is written as a new
+    part file; existing files are never modified. Bars that are already
+    stored may be appended again (e.g. to refresh a bar that was still
+    forming), the newest copy wins when reading.
+
+    Args:
+        root: Root folder of the bar store.
+        ticker: The ticker the bars belong to.
+        timeframe: Timeframe label of the series, e.g. '5minute'.
+        records: Bar records as returned in Polygon's 'results' list.
+
+    Returns:
+        The number of records written.
+    """
+    if not records:
+        return 0
+
+    df = pd.DataFrame.from_records(records)
+    df["t"] = df["t"].astype("int64")
+    df = df.drop_duplicates(subset="t", keep="last").sort_values("t")
+
+    folder = series_folder(root, ticker, timeframe)
+    months = df["t"].map(month_of)
+    for month, chunk in df.groupby(months, sort=True):
+        partition_path = os.path.join(folder, month)
+        os.makedirs(partition_path, exist_ok=True)
+        filename = f"part-{chunk['t'].iloc[0]}-{chunk['t'].iloc[-1]}.parquet"
+        atomic_write_parquet(chunk.reset_index(drop=True), os.path.join(partition_path, filename))
+
+        if len(list_parts(partition_path)) > MAX_PARTS_PER_PARTITION:
+            compact_partition(partition_path)
+
+    return len(df)
+
+
+def _read_partition(partition_path: str, columns: list[str] | None = None,
+                    start_ts: int | None = None, end_ts: int | None = None) -> pd.DataFrame | None:
+    """
+    Reads the parts of a month partition, keeping the newest copy of every bar.
+
+    When a range is given, only the parts whose file name range overlaps it
+    are opened and rows outside it are filtered out while reading.
+    """
+    parts = [part for part in list_parts(partition_path)
+             if (start_ts is None or part[1] >= start_ts) and (end_ts is None or part[0] <= end_ts)]
+    if not parts:
+        return None
+    if columns is not None and "t" not in columns:
+        columns = ["t"] + list(columns)
+
+    filters = []
+    if start_ts is not None:
+        filters.append(("t", ">=", start_ts))
+    if end_ts is not None:
+        filters.append(("t", "<=", end_ts))
+
+    frames = [pd.read_parquet(os.path.join(partition_path, filename), columns=columns,
+                              filters=filters or None)
+              for _, _, filename in parts]
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset="t", keep="last").sort_values("t", kind="stable")
+    return df.reset_index(drop=True)
+
+
+def compact_partition(partition_path: str) -> None:
+    """
+    Merges all part files of a month partition into a single file.
+
+    The merged file is written atomically before the old parts are removed,
+    so an interruption at most leaves duplicate bars, which readers drop.
+    """
+    parts = list_parts(partition_path)
+    if len(parts) <= 1:
+        return
+
+    df = _read_partition(partition_path)
+    filename = f"part-{df['t'].iloc[0]}-{df['t'].iloc[-1]}.parquet"
+    atomic_write_parquet(df, os.path.join(partition_path, filename))
+
+    for _, _, old_filename in parts:
+        if old_filename != filename:
+            os.remove(os.path.join(partition_path, old_filename))
+
+
+def read_bars(root: str, ticker: str, timeframe: str,
+              start_ts: int | None = None, end_ts: int | None = None,
+              columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads the bars of a series, optionally limited to [start_ts, end_ts].
+
+    Only the month partitions and part files overlapping the requested range
+    are opened, so small range reads stay cheap on a large store.
+
+    Returns:
+        A DataFrame sorted by 't' with one row per bar (empty if nothing is stored).
+    """
+    start_month = month_of(start_ts) if start_ts is not None else None
+    end_month = month_of(end_ts) if end_ts is not None else None
+    folder = series_folder(root, ticker, timeframe)
+
+    frames = []
+    for month in list_partitions(root, ticker, timeframe):
+        if (start_month and month < start_month) or (end_month and month > end_month):
+            continue
+        df = _read_partition(os.path.join(folder, month), columns, start_ts, end_ts)
+        if df is not None and len(df):
+            frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=["t"] + [c for c in (columns or []) if c != "t"])
+
+    return pd.concat(frames, ignore_index=True)
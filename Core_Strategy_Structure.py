@@ -1,14 +1,60 @@
 import backtrader as bt
-from datetime import datetime, time
+from datetime import datetime, time, timezone
 
-class OpeningRangeBreakout(bt.Strategy):
+import Event_Log
+from Exit_Simulation import EXIT_AMBIGUOUS, EXIT_REASON_NAMES, classify_bar
+
+class EventRecording:
+    """
+    Event_Log recording shared by the strategies (only used with a recorder).
+    
+    The recorder is owned by the caller, which closes it after the run;
+    stop() only flushes it, so one recorder can serve several runs.
+    """
+    
+    def stop(self):
+        if self.params.recorder:
+            self.params.recorder.flush()
+    
+    def notify_order(self, order):
+        if self.params.recorder:
+            self.record_order(order)
+    
+    def record_event(self, data, event, code, side=0, price=float('nan'),
+                     size=float('nan'), value=float('nan'), ref=-1):
+        self.params.recorder.record(
+            Event_Log.bt_num_to_ms(data.datetime[0]), data._name, event,
+            code, side, price, size, value, ref
+        )
+    
+    def record_signal(self, data, outcome, side):
+        """Signal evaluation with the close and the volume / volume MA ratio"""
+        volume_ma = self.signal_volume_ma(data)
+        volume_ratio = data.volume[0] / volume_ma if volume_ma else float('nan')
+        self.record_event(data, Event_Log.EVENT_SIGNAL, outcome, side=side,
+                          price=data.close[0], value=volume_ratio)
+    
+    def record_order(self, order):
+        side = 1 if order.isbuy() else -1
+        self.record_event(order.data, Event_Log.EVENT_ORDER, order.status, side=side,
+                          price=order.created.price or float('nan'),
+                          size=order.created.size, ref=order.ref)
+        if order.status == order.Completed:
+            self.record_event(order.data, Event_Log.EVENT_FILL, order.status, side=side,
+                              price=order.executed.price, size=order.executed.size,
+                              value=order.executed.comm, ref=order.ref)
+
+
+class OpeningRangeBreakout(EventRecording, bt.Strategy):
     params = dict(
         num_opening_bars=3,      # 15-minute ORB with 5-min bars
         volume_threshold=1.5,    # 150% volume confirmation
         atr_period=14,          # ATR for position sizing
         stop_atr_multiple=2.0,  # Stop loss distance
         profit_atr_multiple=3.0, # Profit target distance
-        max_risk_per_trade=0.02  # 2% risk per trade
+        max_risk_per_trade=0.02, # 2% risk per trade
+        intrabar_resolver=None,  # IntrabarResolver for bars hitting stop and target
+        recorder=None            # Event_Log.EventRecorder for signals, orders and fills (closed by the caller)
     )
     
     def __init__(self):
@@ -38,6 +84,9 @@ class OpeningRangeBreakout(bt.Strategy):
         self.orders = {}
         self.stop_orders = {}
         self.target_orders = {}
+        
+        # (data name, bar datetime, 'stop' / 'target' / 'ambiguous') per exit
+        self.exit_reasons = []
     
     def next(self):
         for data in self.datas:
@@ -57,9 +106,15 @@ class OpeningRangeBreakout(bt.Strategy):
         # Mark range as set after opening period
         if not self.range_set[data]:
             self.range_set[data] = True
+            if self.params.recorder:
+                self.record_event(data, Event_Log.EVENT_BOX_STATE, Event_Log.BOX_RANGE_SET,
+                                  price=self.opening_range_high[data],
+                                  value=self.opening_range_low[data])
         
         # Skip if pending orders
         if data in self.orders and self.orders[data]:
+            if self.params.recorder and not self.getposition(data).size:
+                self.record_event(data, Event_Log.EVENT_SIGNAL, Event_Log.SIGNAL_PENDING_ORDER)
             return
         
         position = self.getposition(data)
@@ -80,6 +135,8 @@ class OpeningRangeBreakout(bt.Strategy):
         )
         
         if not volume_confirmed:
+            if self.params.recorder:
+                self.record_signal(data, Event_Log.SIGNAL_NO_VOLUME, 0)
             return
         
         # Long entry on upward breakout
@@ -88,6 +145,8 @@ class OpeningRangeBreakout(bt.Strategy):
             if size > 0:
                 self.orders[data] = self.buy(data=data, size=size)
                 self.set_stop_and_target(data, True, data.close[0])
+                if self.params.recorder:
+                    self.record_signal(data, Event_Log.SIGNAL_LONG, 1)
         
         # Short entry on downward breakout  
         elif data.close[0] < self.opening_range_low[data]:
@@ -95,6 +154,11 @@ class OpeningRangeBreakout(bt.Strategy):
             if size > 0:
                 self.orders[data] = self.sell(data=data, size=size)
                 self.set_stop_and_target(data, False, data.close[0])
+                if self.params.recorder:
+                    self.record_signal(data, Event_Log.SIGNAL_SHORT, -1)
+        
+        elif self.params.recorder:
+            self.record_signal(data, Event_Log.SIGNAL_NO_BREAKOUT, 0)
     
     def calculate_position_size(self, data, is_long):
         """Risk-based position sizing using ATR"""
@@ -126,34 +190,72 @@ class OpeningRangeBreakout(bt.Strategy):
     
     def manage_position(self, data, position):
         """Manage existing positions with stops and targets"""
-        if position.size > 0:  # Long position
-            if (data.low[0] <= self.stop_orders[data] or 
-                data.high[0] >= self.target_orders[data]):
-                self.close(data=data)
+        if position.size == 0:
+            return
+        
+        reason = self.exit_reason(data, position)
+        if reason != 'open':
+            self.exit_reasons.append((data._name, data.datetime.datetime(0), reason))
+            if self.params.recorder:
+                self.record_exit(data, position, reason)
+            self.close(data=data)
+    
+    def exit_reason(self, data, position):
+        """Which level closes the position on this bar ('open' if none), looking inside the bar if both were hit"""
+        is_long = position.size > 0
+        stop, target = self.stop_orders[data], self.target_orders[data]
+        reason = classify_bar(data.open[0], data.high[0], data.low[0], is_long, stop, target)
         
-        elif position.size < 0:  # Short position
-            if (data.high[0] >= self.stop_orders[data] or 
-                data.low[0] <= self.target_orders[data]):
-                self.close(data=data)
+        if reason == EXIT_AMBIGUOUS and self.params.intrabar_resolver is not None:
+            # The close still fills at the next open, only the reason is refined.
+            # Bar datetimes are taken as UTC bar start times.
+            bar_start = data.datetime.datetime(0).replace(tzinfo=timezone.utc)
+            reason, _ = self.params.intrabar_resolver.resolve(
+                int(bar_start.timestamp() * 1000), is_long, stop, target,
+                ticker=data._name or None
+            )
+        return EXIT_REASON_NAMES[reason]
+    
+    def exit_counts(self):
+        """Number of exits per reason ('stop', 'target', 'ambiguous')"""
+        counts = {'stop': 0, 'target': 0, 'ambiguous': 0}
+        for _, _, reason in self.exit_reasons:
+            counts[reason] += 1
+        return counts
     
     def notify_order(self, order):
         """Handle order notifications"""
+        super().notify_order(order)
+        
         if order.status in [order.Completed, order.Canceled, order.Rejected]:
             # Clear order reference
             for data in self.datas:
                 if self.orders.get(data) == order:
                     self.orders[data] = None
                     break
+    
+    # --- Event recording (only called with a recorder) ---
+    
+    def signal_volume_ma(self, data):
+        return self.volume_ma[data][0]
+    
+    def record_exit(self, data, position, reason):
+        """Exit decision with the stop as price and the target as value"""
+        code = next(code for code, name in EXIT_REASON_NAMES.items() if name == reason)
+        self.record_event(data, Event_Log.EVENT_EXIT, code,
+                          side=1 if position.size > 0 else -1,
+                          price=self.stop_orders[data], value=self.target_orders[data])
 
 
 # Enhanced multi-data portfolio implementation
-class PortfolioORBStrategy(bt.Strategy):
+class PortfolioORBStrategy(EventRecording, bt.Strategy):
     params = dict(
         num_opening_bars=3,
         max_positions=5,
         volume_threshold=1.5,
         ma_period=50,
-        use_ma_filter=True
+        use_ma_filter=True,
+        recorder=None            # Event_Log.EventRecorder for signals, orders and fills (closed by the caller)
     )
     
     def __init__(self):
@@ -192,11 +294,19 @@ class PortfolioORBStrategy(bt.Strategy):
             )
             return
         
+        if not self.opening_ranges[data]['set'] and self.params.recorder:
+            self.record_event(data, Event_Log.EVENT_BOX_STATE, Event_Log.BOX_RANGE_SET,
+                              price=self.opening_ranges[data]['high'],
+                              value=self.opening_ranges[data]['low'])
         self.opening_ranges[data]['set'] = True
         
         # Skip if max positions reached or pending order
         if (current_positions >= self.params.max_positions or 
             self.orders[data]):
+            if self.params.recorder and not self.getposition(data).size:
+                skipped = (Event_Log.SIGNAL_PENDING_ORDER if self.orders[data]
+                           else Event_Log.SIGNAL_MAX_POSITIONS)
+                self.record_signal(data, skipped, 0)
             return
         
         position = self.getposition(data)
@@ -212,6 +322,8 @@ class PortfolioORBStrategy(bt.Strategy):
         )
         
         if not volume_confirmed:
+            if self.params.recorder:
+                self.record_signal(data, Event_Log.SIGNAL_NO_VOLUME, 0)
             return
         
         # Moving average filter
@@ -223,21 +335,37 @@ class PortfolioORBStrategy(bt.Strategy):
                 data.close[0] > price_ma):
                 size = self.calculate_portfolio_size(data)
                 self.orders[data] = self.buy(data=data, size=size)
+                if self.params.recorder:
+                    self.record_signal(data, Event_Log.SIGNAL_LONG, 1)
             
             # Short entry: below opening range low AND below MA
             elif (data.close[0] < self.opening_ranges[data]['low'] and 
                   data.close[0] < price_ma):
                 size = self.calculate_portfolio_size(data)
                 self.orders[data] = self.sell(data=data, size=size)
+                if self.params.recorder:
+                    self.record_signal(data, Event_Log.SIGNAL_SHORT, -1)
+            
+            elif self.params.recorder:
+                breakout = (data.close[0] > self.opening_ranges[data]['high'] or
+                            data.close[0] < self.opening_ranges[data]['low'])
+                self.record_signal(data, Event_Log.SIGNAL_MA_FILTER if breakout
+                                   else Event_Log.SIGNAL_NO_BREAKOUT, 0)
         
         else:
             # No MA filter - trade both directions
             if data.close[0] > self.opening_ranges[data]['high']:
                 size = self.calculate_portfolio_size(data)
                 self.orders[data] = self.buy(data=data, size=size)
+                if self.params.recorder:
+                    self.record_signal(data, Event_Log.SIGNAL_LONG, 1)
             elif data.close[0] < self.opening_ranges[data]['low']:
                 size = self.calculate_portfolio_size(data)
                 self.orders[data] = self.sell(data=data, size=size)
+                if self.params.recorder:
+                    self.record_signal(data, Event_Log.SIGNAL_SHORT, -1)
+            elif self.params.recorder:
+                self.record_signal(data, Event_Log.SIGNAL_NO_BREAKOUT, 0)
     
     def calculate_portfolio_size(self, data):
         """Portfolio-level position sizing"""
@@ -252,4 +380,7 @@ class PortfolioORBStrategy(bt.Strategy):
         if stop_distance > 0:
             shares = int(risk_per_position / stop_distance)
             return max(shares, 1)
-        return 1
\ No newline at end of file
+        return 1
+    
+    def signal_volume_ma(self, data):
+        return self.indicators[data]['volume_ma'][0]
\ No newline at end of file
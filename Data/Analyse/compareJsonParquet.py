@@ -1,11 +1,15 @@
 import os
 import json
-import pandas as pd
 
-def compare_file_counts():
+def compare_file_counts(json_filepath: str | None = None, parquet_filepath: str | None = None):
     """
-    Compares the number of records in a JSON file and a Parquet file
-    located one directory above the script.
+    Compares the number of records in a JSON file and a Parquet file.
+
+    Args:
+        json_filepath: Path to the JSON file. Defaults to
+            'btcusd_5min_all_PolygonIO.json' one directory above the script.
+        parquet_filepath: Path to the Parquet file. Defaults to
+            'btcusd_5min_all_PolygonIO.parquet' one directory above the script.
     """
     print("--- Starting File Comparison ---")
 
@@ -16,10 +20,12 @@ def compare_file_counts():
     parent_dir = os.path.dirname(script_dir)
 
     # Define the full paths to the files
-    json_filename = "btcusd_5min_all_PolygonIO.json"
-    parquet_filename = "btcusd_5min_all_PolygonIO.parquet"
-    json_filepath = os.path.join(parent_dir, json_filename)
-    parquet_filepath = os.path.join(parent_dir, parquet_filename)
+    if json_filepath is None:
+        json_filepath = os.path.join(parent_dir, "btcusd_5min_all_PolygonIO.json")
+    if parquet_filepath is None:
+        parquet_filepath = os.path.join(parent_dir, "btcusd_5min_all_PolygonIO.parquet")
+    json_filename = os.path.basename(json_filepath)
+    parquet_filename = os.path.basename(parquet_filepath)
 
     json_count = 0
     parquet_count = 0
@@ -47,6 +53,8 @@ def compare_file_counts():
     # --- PROCESS PARQUET FILE ---
     print(f"\nAttempting to read Parquet file: {parquet_filepath}")
     try:
+        # Imported here so counting the JSON records doesn't pay for pandas
+        import pandas as pd
         # Read the Parquet file into a pandas DataFrame
         df = pd.read_parquet(parquet_filepath)
         # The number of items is the number of rows in the DataFrame
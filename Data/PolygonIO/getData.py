@@ -1,13 +1,17 @@
 import os
+import sys
 import requests
-import json
 import time
-from datetime import datetime, date, timedelta
-import re
+from datetime import datetime, date, timedelta, timezone
+
+# The bar store module lives in the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from Bar_Store import append_bars, latest_timestamp, series_folder
 
 # --- CONFIGURATION ---
-# IMPORTANT: Replace "YOUR_API_KEY" with your actual Polygon.io API key.
-API_KEY = "Kb6vPmc_7ZJLwan_yxsyyZCUHB1KxPrY" 
+# IMPORTANT: Replace "YOUR_API_KEY" with your actual Polygon.io API key, or pass it
+# via [fetch].api_key / POLYGON_API_KEY when running through Trading_CLI.py.
+API_KEY = "YOUR_API_KEY"
 # The ticker you want to fetch data for.
 TICKER = "X:BTCUSD"
 # The timeframe for the data aggregation (e.g., 'minute', 'hour', 'day').
@@ -16,117 +20,74 @@ TIMEFRAME_VALUE = 5
 TIMEFRAME_UNIT = "minute"
 # The subfolder where data files are stored.
 DATA_FOLDER = "Data"
+# The partitioned Parquet bar store inside the data folder.
+STORE_FOLDER = os.path.join(DATA_FOLDER, "bars")
 # The maximum number of results to fetch per API call. 50000 is the max.
 LIMIT = 50000
 # Rate limit: 5 requests per minute means 1 request every 12 seconds.
 SLEEP_INTERVAL = 12
 
-def get_latest_end_date(folder_path: str) -> date | None:
-    """
-    Scans a directory for data files and determines the latest end date from filenames.
-
-    The expected filename format is 'btcusd_{timeframe}_{start_date}_{end_date}_PolygonIO.json'.
-    Example: 'btcusd_1day_2023-06-11_2023-07-15_PolygonIO.json'
+def timeframe_label() -> str:
+    """Label of the stored series, e.g. '5minute'."""
+    return f"{TIMEFRAME_VALUE}{TIMEFRAME_UNIT}"
 
-    Args:
-        folder_path: The path to the directory containing the data files.
+def to_millis(moment: datetime) -> int:
+    """Converts a timezone-aware datetime to a Unix millisecond timestamp."""
+    return int(moment.timestamp() * 1000)
 
-    Returns:
-        A datetime.date object representing the latest end date found, 
-        or None if no valid files are found.
-    """
-    latest_date = None
-    # Regex to extract the end date (YYYY-MM-DD) from the filename.
-    date_pattern = re.compile(r"_(\d{4}-\d{2}-\d{2})_PolygonIO\.json$")
-
-    if not os.path.exists(folder_path):
-        print(f"Data folder '{folder_path}' not found. It will be created.")
-        os.makedirs(folder_path)
-        return None
-
-    for filename in os.listdir(folder_path):
-        match = date_pattern.search(filename)
-        if match:
-            try:
-                end_date_str = match.group(1)
-                current_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-                if latest_date is None or current_date > latest_date:
-                    latest_date = current_date
-            except ValueError:
-                print(f"Warning: Could not parse date from filename: {filename}")
-                continue
-    
-    if latest_date:
-        print(f"Latest end date found in existing files: {latest_date}")
-    else:
-        print("No existing data files found.")
-        
-    return latest_date
+def format_millis(timestamp_ms: int) -> str:
+    """Formats a Unix millisecond timestamp for log output (UTC)."""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
 
-def fetch_and_save_data(start_date: date, end_date: date) -> tuple[date | None, int, int | None]:
+def fetch_and_save_data(start_ts: int, end_ts: int) -> tuple[int, int | None, bool]:
     """
-    Fetches data from the Polygon.io API for a given date range and saves it to a file.
+    Fetches one page of data from the Polygon.io API and appends it to the bar store.
 
     Args:
-        start_date: The start date for the data fetch.
-        end_date: The end date for the data fetch.
+        start_ts: Unix millisecond timestamp of the first bar to fetch (inclusive).
+        end_ts: Unix millisecond timestamp of the last bar to fetch (inclusive).
 
     Returns:
         A tuple containing:
-        - The actual end date of the data received from the API (or None if no data).
         - The number of results fetched.
         - The Unix millisecond timestamp of the last record fetched (or None).
+        - Whether the API reported another page after this one.
     """
-    start_date_str = start_date.strftime("%Y-%m-%d")
-    end_date_str = end_date.strftime("%Y-%m-%d")
-
-    # Construct the API URL
+    # Polygon accepts millisecond timestamps in place of dates
     url = (
         f"https://api.polygon.io/v2/aggs/ticker/{TICKER}/range/{TIMEFRAME_VALUE}/"
-        f"{TIMEFRAME_UNIT}/{start_date_str}/{end_date_str}"
+        f"{TIMEFRAME_UNIT}/{start_ts}/{end_ts}"
         f"?adjusted=true&sort=asc&limit={LIMIT}&apiKey={API_KEY}"
     )
 
-    print(f"\nFetching data from {start_date_str} to {end_date_str}...")
-    
+    print(f"\nFetching data from {format_millis(start_ts)} to {format_millis(end_ts)} UTC...")
+
     try:
         response = requests.get(url)
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
     except requests.exceptions.RequestException as e:
         print(f"Error making API request: {e}")
-        return None, 0, None
+        return 0, None, False
 
     data = response.json()
     results_count = data.get("resultsCount", 0)
 
     # Check if the API returned any results
     if results_count == 0 or "results" not in data:
-        return None, 0, None
+        return 0, None, False
 
-    # Determine the actual start and end dates from the returned data
     results = data["results"]
     actual_start_ts = results[0]['t']
     actual_end_ts = results[-1]['t']
 
-    # Polygon timestamps are in milliseconds, so divide by 1000
-    actual_start_date = datetime.fromtimestamp(actual_start_ts / 1000).date()
-    actual_end_date = datetime.fromtimestamp(actual_end_ts / 1000).date()
-    
-    print(f"Successfully fetched {results_count} data points from {actual_start_date} to {actual_end_date}.")
-
-    # Create the filename based on the content of the data
-    filename_start_str = actual_start_date.strftime("%Y-%m-%d")
-    filename_end_str = actual_end_date.strftime("%Y-%m-%d")
-    filename = f"btcusd_{TIMEFRAME_VALUE}{TIMEFRAME_UNIT}_{filename_start_str}_{filename_end_str}_PolygonIO.json"
-    filepath = os.path.join(DATA_FOLDER, filename)
-
-    # Save the data to a JSON file
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=4)
-    
-    print(f"Data saved to: {filepath}")
-    
-    return actual_end_date, results_count, actual_end_ts
+    print(f"Successfully fetched {results_count} data points from "
+          f"{format_millis(actual_start_ts)} to {format_millis(actual_end_ts)} UTC.")
+
+    # Append the page straight to the partitioned store (written atomically)
+    written = append_bars(STORE_FOLDER, TICKER, timeframe_label(), results)
+    print(f"Appended {written} bars to: {series_folder(STORE_FOLDER, TICKER, timeframe_label())}")
+
+    return results_count, actual_end_ts, "next_url" in data
 
 def main():
     """Main function to orchestrate the data fetching loop."""
@@ -137,48 +98,47 @@ def main():
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         return
 
-    today = date.today()
-    
-    # Determine the starting date for the first API call
-    start_date = get_latest_end_date(DATA_FOLDER)
-    
-    if start_date is None:
+    end_ts = to_millis(datetime.now(timezone.utc))
+
+    # Determine the starting timestamp for the first API call
+    start_ts = latest_timestamp(STORE_FOLDER, TICKER, timeframe_label())
+
+    if start_ts is None:
         # If no data exists, start from 2 years ago (Polygon's limit)
-        start_date = today - timedelta(days=730)
-        print(f"No start date found. Starting from two years ago: {start_date}")
+        start_date = date.today() - timedelta(days=730)
+        start_ts = to_millis(datetime(start_date.year, start_date.month, start_date.day, tzinfo=timezone.utc))
+        print(f"No stored bars found. Starting from two years ago: {start_date}")
     else:
-        # Resume data fetch from the last known date to get any new intra-day data.
-        print(f"Resuming data fetch from: {start_date}")
+        # Resume from the last stored bar itself: it may still have been forming
+        # when it was fetched, so it is fetched again and the newer copy wins.
+        print(f"Resuming data fetch from the last stored bar: {format_millis(start_ts)} UTC")
 
-    latest_record_timestamp = None
-    
-    # Loop until we have fetched data up to today
-    while start_date <= today:
-        # Fetch data and get the actual end date and number of results
-        new_end_date, results_count, last_ts_in_batch = fetch_and_save_data(start_date, today)
+    # Loop until we have fetched data up to now
+    while start_ts <= end_ts:
+        results_count, last_ts_in_batch, has_more = fetch_and_save_data(start_ts, end_ts)
 
         # ---- ROBUST STOPPING CONDITIONS ----
-        
-        # Condition 1: API returns no results. We are fully caught up. This is the main exit point.
+
+        # Condition 1: API returns no results. We are fully caught up.
         if results_count == 0:
             print("API returned 0 results. Caught up to the latest available data. Exiting.")
             break
-        
-        # Condition 2: Stagnation. We are fetching the same last record repeatedly.
-        # This prevents an infinite loop if the last page of data has exactly `LIMIT` results.
-        if last_ts_in_batch is not None and last_ts_in_batch == latest_record_timestamp:
-            print("Fetched the same last data point again. Assuming the dataset is complete. Exiting.")
+
+        # Condition 2: No further pages. This is the main exit point and keeps a
+        # daily top-up down to a single request.
+        if not has_more:
+            print("No further pages reported by the API. Caught up to the latest available data. Exiting.")
             break
 
-        # Update state for the next loop.
-        if new_end_date is not None:
-             latest_record_timestamp = last_ts_in_batch
-             start_date = new_end_date
-        else:
-            # Should not happen if results_count > 0, but as a safeguard:
-            print("Error: Received results but could not determine a new date. Exiting.")
+        # Condition 3: Stagnation. The page didn't get past the bar we started from.
+        # This prevents an infinite loop if the API keeps returning the same data.
+        if last_ts_in_batch is None or last_ts_in_batch <= start_ts:
+            print("Fetched no data beyond the last stored bar. Assuming the dataset is complete. Exiting.")
             break
 
+        # Update state for the next loop: continue right after the last record.
+        start_ts = last_ts_in_batch + 1
+
         # IMPORTANT: Wait before the next API call to respect the rate limit.
         print(f"Waiting for {SLEEP_INTERVAL} seconds before next request...")
         time.sleep(SLEEP_INTERVAL)
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def engulfing_components(open_, close, volume=None, mintick=0.01):
+    """
+    Per-bar building blocks of detect_engulfing() in engulfing_box_strategy.pine.
+
+    Everything that doesn't depend on a filter setting is computed once, so
+    the filters can be applied for many settings without another pass.
+
+    Returns:
+        A dict of arrays: 'bullish' / 'bearish' (raw engulfing patterns),
+        'engulf_percent' (current body in % of the previous body, NaN
+        on the first bar) and
+        'volume_up' (volume above the previous bar's, True without volume data).
+    """
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    prev_open = np.roll(open_, 1)
+    prev_close = np.roll(close, 1)
+    prev_body_size = np.abs(prev_close - prev_open)
+    curr_body_size = np.abs(close - open_)
+
+    is_prev_bearish = prev_close < prev_open
+    is_prev_bullish = prev_close > prev_open
+    is_curr_bearish = close < open_
+    is_curr_bullish = close > open_
+
+    bullish = is_prev_bearish & is_curr_bullish & (open_ <= prev_close) & (close >= prev_open)
+    bearish = is_prev_bullish & is_curr_bearish & (open_ >= prev_close) & (close <= prev_open)
+
+    # The first bar has no previous candle
+    bullish[:1] = False
+    bearish[:1] = False
+
+    # Add a small value to prev_body_size to avoid division by zero on doji candles
+    engulf_percent = curr_body_size / (prev_body_size + mintick) * 100
+    engulf_percent[:1] = np.nan
+
+    if volume is None:
+        volume_up = np.ones(len(close), dtype=bool)
+    else:
+        volume = np.asarray(volume, dtype=np.float64)
+        prev_volume = np.roll(volume, 1)
+        # Bypass the filter where volume data is not available (na in Pine)
+        volume_up = np.isnan(volume) | (volume > prev_volume)
+        volume_up[:1] = np.isnan(volume[:1])
+
+    return {
+        'bullish': bullish,
+        'bearish': bearish,
+        'engulf_percent': engulf_percent,
+        'volume_up': volume_up,
+    }
+
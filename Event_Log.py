@@ -0,0 +1,293 @@
+"""
+Append-only binary log of strategy events (signals, orders, fills, exits and
+opening range state transitions) with a query and replay API.
+
+File layout: an 8-byte magic header followed by chunks. Every chunk has a
+small header (row count, min/max timestamp) and then each column as a
+contiguous little-endian array, so queries read whole columns with
+np.frombuffer and skip chunks outside the requested time range. Symbol names
+are kept in a '<log>.symbols' sidecar file, one per line, in id order.
+"""
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b'EVLOG001'
+CHUNK_HEADER = struct.Struct('<4sIqq')  # b'CHNK', rows, min ts, max ts
+CHUNK_MAGIC = b'CHNK'
+
+# Event types
+EVENT_SIGNAL = 1      # Entry signal evaluation (code: SIGNAL_*)
+EVENT_ORDER = 2       # Order notification (code: backtrader order status)
+EVENT_FILL = 3        # Order execution (price / size / value = commission)
+EVENT_EXIT = 4        # Stop/target exit decision (code: Exit_Simulation EXIT_*)
+EVENT_BOX_STATE = 5   # Opening range state transition (code: BOX_*)
+
+EVENT_NAMES = {
+    EVENT_SIGNAL: 'signal',
+    EVENT_ORDER: 'order',
+    EVENT_FILL: 'fill',
+    EVENT_EXIT: 'exit',
+    EVENT_BOX_STATE: 'box_state',
+}
+
+# Signal evaluation outcomes
+SIGNAL_NO_VOLUME = 0        # Volume confirmation failed
+SIGNAL_NO_BREAKOUT = 1      # Volume confirmed, close inside the range
+SIGNAL_LONG = 2             # Long entry submitted
+SIGNAL_SHORT = 3            # Short entry submitted
+SIGNAL_PENDING_ORDER = 4    # Skipped, an order is still pending
+SIGNAL_MAX_POSITIONS = 5    # Skipped, PortfolioORBStrategy holds max_positions
+SIGNAL_MA_FILTER = 6        # Breakout rejected by PortfolioORBStrategy's MA filter
+
+# Box states (price / value = opening range high / low)
+BOX_RANGE_SET = 0     # The opening range is complete
+
+# Columns in file order
+DTYPE = np.dtype([
+    ('ts', '<i8'),        # Unix milliseconds (UTC)
+    ('symbol', '<u2'),    # Index into the symbol table
+    ('event', 'u1'),      # EVENT_*
+    ('code', 'i1'),       # Event specific code
+    ('side', 'i1'),       # +1 long / buy, -1 short / sell, 0 none
+    ('price', '<f8'),
+    ('size', '<f8'),
+    ('value', '<f8'),     # Event specific extra value
+    ('ref', '<i4'),       # Order reference, -1 if none
+])
+
+Event = namedtuple('Event', ['ts', 'symbol', 'event', 'code', 'side', 'price', 'size', 'value', 'ref'])
+
+# Backtrader date number (days since 0001-01-01, plus one) of the Unix epoch
+_BT_EPOCH = 719163.0
+
+
+def bt_num_to_ms(num):
+    """Converts a backtrader date number (data.datetime[0]) to Unix milliseconds."""
+    return int(round((num - _BT_EPOCH) * 86400000))
+
+
+def _truncate_partial_chunk(path):
+    """Cuts off a chunk left incomplete by an interrupted write, so appends stay readable."""
+    with open(path, 'r+b') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not an event log")
+        total = os.fstat(f.fileno()).st_size
+        offset = len(MAGIC)
+        while offset + CHUNK_HEADER.size <= total:
+            f.seek(offset)
+            magic, rows, _, _ = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+            end = offset + CHUNK_HEADER.size + rows * DTYPE.itemsize
+            if magic != CHUNK_MAGIC or end > total:
+                break
+            offset = end
+        if offset < total:
+            f.truncate(offset)
+
+
+class EventRecorder:
+    """
+    Buffers events in memory and appends them to the log in chunks.
+
+    record() only appends a tuple to a list, the conversion to columns
+    happens once per chunk in flush().
+    """
+
+    def __init__(self, path, chunk_size=65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._rows = []
+
+        # Continue the symbol table of an existing log
+        self._symbols = {}
+        self._symbols_path = f"{path}.symbols"
+        if os.path.exists(self._symbols_path):
+            with open(self._symbols_path, 'r') as f:
+                for line in f:
+                    self._symbols[line.rstrip('\n')] = len(self._symbols)
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            _truncate_partial_chunk(path)
+        self._file = open(path, 'ab')
+        if new_file:
+            # Readers opening the log before the first chunk need the header
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def symbol_id(self, symbol):
+        """Id of a symbol, registering it in the symbol table on first use."""
+        symbol_id = self._symbols.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self._symbols)
+            self._symbols[symbol] = symbol_id
+            with open(self._symbols_path, 'a') as f:
+                f.write(f"{symbol}\n")
+        return symbol_id
+
+    def record(self, ts, symbol, event, code=0, side=0, price=np.nan, size=np.nan,
+               value=np.nan, ref=-1):
+        """Adds one event. ts is in Unix milliseconds, symbol a name."""
+        symbol_id = self._symbols.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_id(symbol)
+        rows = self._rows
+        rows.append((ts, symbol_id, event, code, side, price, size, value, ref))
+        if len(rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Appends the buffered events to the log as one chunk."""
+        if not self._rows:
+            return
+        rows = np.array(self._rows, dtype=DTYPE)
+        self._rows = []
+
+        parts = [CHUNK_HEADER.pack(CHUNK_MAGIC, len(rows), rows['ts'].min(), rows['ts'].max())]
+        parts.extend(rows[name].tobytes() for name in DTYPE.names)
+        # One write per chunk, a crash can at most truncate the last chunk
+        self._file.write(b''.join(parts))
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EventLog:
+    """Read access to an event log: vectorized queries and ordered replay."""
+
+    def __init__(self, path):
+        self.path = path
+
+        self.symbols = []
+        symbols_path = f"{path}.symbols"
+        if os.path.exists(symbols_path):
+            with open(symbols_path, 'r') as f:
+                self.symbols = [line.rstrip('\n') for line in f]
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"'{path}' is not an event log")
+
+        self._chunks = self._index_chunks()
+
+    def _index_chunks(self):
+        """(offset of the first column, rows, min ts, max ts) of every complete chunk."""
+        chunks = []
+        offset = len(MAGIC)
+        total = len(self._buffer)
+        while offset + CHUNK_HEADER.size <= total:
+            magic, rows, ts_min, ts_max = CHUNK_HEADER.unpack_from(self._buffer, offset)
+            data_offset = offset + CHUNK_HEADER.size
+            end = data_offset + rows * DTYPE.itemsize
+            if magic != CHUNK_MAGIC or end > total:
+                # Truncated tail of an interrupted write
+                break
+            chunks.append((data_offset, rows, ts_min, ts_max))
+            offset = end
+        return chunks
+
+    def __len__(self):
+        return sum(rows for _, rows, _, _ in self._chunks)
+
+    def _columns(self, data_offset, rows, names):
+        """Zero-copy views on columns of one chunk."""
+        columns = {}
+        offset = data_offset
+        for name in DTYPE.names:
+            dtype = DTYPE[name]
+            if name in names:
+                columns[name] = np.frombuffer(self._buffer, dtype=dtype, count=rows, offset=offset)
+            offset += rows * dtype.itemsize
+        return columns
+
+    def query(self, symbol=None, start=None, end=None, event=None):
+        """
+        Events matching all given filters, in log order.
+
+        Args:
+            symbol: Symbol name or list of names.
+            start, end: Inclusive Unix millisecond time range.
+            event: Event type (EVENT_*) or list of types.
+
+        Returns:
+            A numpy structured array with the DTYPE columns.
+        """
+        symbol_ids = None
+        if symbol is not None:
+            names = [symbol] if isinstance(symbol, str) else list(symbol)
+            symbol_ids = [self.symbols.index(name) for name in names if name in self.symbols]
+            if not symbol_ids:
+                return np.empty(0, dtype=DTYPE)
+        events = None if event is None else np.atleast_1d(event)
+
+        # Columns needed to evaluate the filters
+        filter_names = {'ts'} if start is not None or end is not None else set()
+        if symbol_ids is not None:
+            filter_names.add('symbol')
+        if events is not None:
+            filter_names.add('event')
+
+        selected = []
+        for data_offset, rows, ts_min, ts_max in self._chunks:
+            if (start is not None and ts_max < start) or (end is not None and ts_min > end):
+                continue
+
+            mask = np.ones(rows, dtype=bool)
+            columns = self._columns(data_offset, rows, filter_names)
+            if start is not None:
+                mask &= columns['ts'] >= start
+            if end is not None:
+                mask &= columns['ts'] <= end
+            if symbol_ids is not None:
+                mask &= np.isin(columns['symbol'], symbol_ids)
+            if events is not None:
+                mask &= np.isin(columns['event'], events)
+            if not mask.any():
+                continue
+
+            chunk = np.empty(int(mask.sum()), dtype=DTYPE)
+            for name, values in self._columns(data_offset, rows, DTYPE.names).items():
+                chunk[name] = values[mask]
+            selected.append(chunk)
+
+        if not selected:
+            return np.empty(0, dtype=DTYPE)
+        return np.concatenate(selected)
+
+    def replay(self, callback=None, **filters):
+        """
+        Replays matching events in log order without re-running the strategy.
+
+        Takes the same filters as query(). Every event is passed to callback
+        as an Event tuple with symbol and event names resolved; without a
+        callback the events are yielded instead.
+        """
+        events = self._iter_events(self.query(**filters))
+        if callback is None:
+            return events
+        for event in events:
+            callback(event)
+        return None
+
+    def _iter_events(self, rows):
+        for row in rows.tolist():
+            ts, symbol_id, event, code, side, price, size, value, ref = row
+            yield Event(ts, self.symbols[symbol_id], EVENT_NAMES.get(event, event),
+                        code, side, price, size, value, ref)
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
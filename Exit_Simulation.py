@@ -0,0 +1,176 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Fall back to plain Python when numba is not installed. Results are
+    # identical, only (much) slower.
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Exit reasons returned by simulate_exits()
+EXIT_NONE = 0        # Still open at the end of the data
+EXIT_STOP = 1        # Stop loss was hit
+EXIT_TARGET = 2      # Profit target was hit
+EXIT_AMBIGUOUS = 3   # Both levels inside the same bar, order unknown
+
+EXIT_REASON_NAMES = {
+    EXIT_NONE: 'open',
+    EXIT_STOP: 'stop',
+    EXIT_TARGET: 'target',
+    EXIT_AMBIGUOUS: 'ambiguous',
+}
+
+# Fill models
+FILL_NEXT_OPEN = 0   # OpeningRangeBreakout: self.close() fills at the next bar's open
+FILL_LEVEL = 1       # Pine strategy.exit(): stop/limit fill at the level (or the gap open)
+
+_FILL_MODES = {'next_open': FILL_NEXT_OPEN, 'level': FILL_LEVEL}
+
+
+def atr_levels(entry_price, atr, direction, stop_atr_multiple=2.0, profit_atr_multiple=3.0):
+    """ATR-multiple stop and target levels, as in OpeningRangeBreakout.set_stop_and_target"""
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    sign = np.where(np.asarray(direction) > 0, 1.0, -1.0)
+
+    stop = entry_price - sign * (atr * stop_atr_multiple)
+    target = entry_price + sign * (atr * profit_atr_multiple)
+    return stop, target
+
+
+def percent_levels(entry_price, direction, stop_loss_percent=2.0, take_profit_percent=4.0):
+    """Percentage stop and target levels, as in engulfing_box_strategy.pine"""
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    is_long = np.asarray(direction) > 0
+
+    stop = np.where(is_long,
+                    entry_price * (1 - stop_loss_percent / 100),
+                    entry_price * (1 + stop_loss_percent / 100))
+    target = np.where(is_long,
+                      entry_price * (1 + take_profit_percent / 100),
+                      entry_price * (1 - take_profit_percent / 100))
+    return stop, target
+
+
+@njit(cache=True)
+def classify_bar(bar_open, bar_high, bar_low, is_long, stop, target):
+    """Exit reason for a single bar, EXIT_NONE if neither level was touched"""
+    if is_long:
+        hit_stop = bar_low <= stop
+        hit_target = bar_high >= target
+    else:
+        hit_stop = bar_high >= stop
+        hit_target = bar_low <= target
+
+    if hit_stop and hit_target:
+        # A gap through one of the levels settles the order at the open
+        if (is_long and bar_open <= stop) or (not is_long and bar_open >= stop):
+            return EXIT_STOP
+        if (is_long and bar_open >= target) or (not is_long and bar_open <= target):
+            return EXIT_TARGET
+        return EXIT_AMBIGUOUS
+    if hit_stop:
+        return EXIT_STOP
+    if hit_target:
+        return EXIT_TARGET
+    return EXIT_NONE
+
+
+@njit(cache=True)
+def level_fill_price(bar_open, is_long, reason, stop, target):
+    """Fill price of a resting stop/limit order, honouring gaps through the level"""
+    if reason == EXIT_TARGET:
+        if is_long:
+            return max(bar_open, target)
+        return min(bar_open, target)
+    # Stop, and ambiguous bars are assumed to stop out first (conservative)
+    if is_long:
+        return min(bar_open, stop)
+    return max(bar_open, stop)
+
+
+@njit(cache=True)
+def _simulate_exits(open_, high, low, entry_idx, direction, stop, target, fill_mode,
+                    exit_idx, exit_price, exit_reason):
+    n_bars = high.shape[0]
+
+    for k in range(entry_idx.shape[0]):
+        exit_idx[k] = -1
+        exit_price[k] = np.nan
+        exit_reason[k] = EXIT_NONE
+        is_long = direction[k] > 0
+
+        # The entry order fills on the bar after the signal, and that bar is
+        # already checked against the stop and target.
+        for i in range(entry_idx[k] + 1, n_bars):
+            reason = classify_bar(open_[i], high[i], low[i], is_long, stop[k], target[k])
+            if reason == EXIT_NONE:
+                continue
+
+            if fill_mode == FILL_NEXT_OPEN:
+                # A close submitted on the last bar never fills
+                if i + 1 < n_bars:
+                    exit_idx[k] = i + 1
+                    exit_price[k] = open_[i + 1]
+                    exit_reason[k] = reason
+            else:
+                exit_idx[k] = i
+                exit_price[k] = level_fill_price(open_[i], is_long, reason, stop[k], target[k])
+                exit_reason[k] = reason
+            break
+
+
+def simulate_exits(open_, high, low, entry_idx, direction, stop, target, fill='next_open'):
+    """
+    Simulates the stop/target exit of many trades in one compiled pass.
+
+    Every trade is independent: entry_idx is the bar the entry signal fired on
+    (the order fills on the next bar) and the position is closed on the first
+    bar whose range touches the stop or the target.
+
+    Args:
+        open_, high, low: Price arrays of the traded instrument.
+        entry_idx: Signal bar index of every trade.
+        direction: +1 for long trades, -1 for short trades.
+        stop, target: Stop loss and profit target level of every trade
+            (see atr_levels() and percent_levels()).
+        fill: 'next_open' replicates OpeningRangeBreakout.manage_position,
+            which closes with a market order filled at the next bar's open.
+            'level' fills at the stop/target price like Pine's strategy.exit().
+
+    Returns:
+        A tuple of arrays (exit_idx, exit_price, exit_reason). Trades still
+        open at the end of the data have exit_idx -1, a NaN price and
+        EXIT_NONE as reason.
+    """
+    if fill not in _FILL_MODES:
+        raise ValueError(f"Unknown fill model '{fill}', expected one of {sorted(_FILL_MODES)}")
+
+    open_ = np.ascontiguousarray(open_, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    entry_idx = np.ascontiguousarray(entry_idx, dtype=np.int64)
+    direction = np.ascontiguousarray(direction, dtype=np.int8)
+    stop = np.ascontiguousarray(stop, dtype=np.float64)
+    target = np.ascontiguousarray(target, dtype=np.float64)
+
+    n_bars = high.shape[0]
+    if not (open_.shape[0] == low.shape[0] == n_bars):
+        raise ValueError("open_, high and low must have the same length")
+
+    n_trades = entry_idx.shape[0]
+    if not (direction.shape[0] == stop.shape[0] == target.shape[0] == n_trades):
+        raise ValueError("entry_idx, direction, stop and target must have the same length")
+    if n_trades and (entry_idx.min() < 0 or entry_idx.max() >= n_bars):
+        raise ValueError(f"entry_idx must lie within the {n_bars} price bars")
+
+    exit_idx = np.empty(n_trades, dtype=np.int64)
+    exit_price = np.empty(n_trades, dtype=np.float64)
+    exit_reason = np.empty(n_trades, dtype=np.int8)
+
+    _simulate_exits(open_, high, low, entry_idx, direction, stop, target,
+                    _FILL_MODES[fill], exit_idx, exit_price, exit_reason)
+    return exit_idx, exit_price, exit_reason
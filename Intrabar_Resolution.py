@@ -0,0 +1,185 @@
+import os
+from collections import OrderedDict
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from Bar_Store import read_bars
+from Exit_Simulation import EXIT_AMBIGUOUS, EXIT_NONE, classify_bar, level_fill_price
+
+_DAY_MS = 86400000
+
+
+def _to_ms(moment):
+    return int(moment.timestamp() * 1000)
+
+
+class IntrabarResolver:
+    """
+    Resolves bars whose range touches both the stop and the target.
+
+    Such a bar can't tell which level was hit first. The resolver looks at the
+    finer-grained bars of that one bar in the local bar store and replays them
+    in order. Fine bars are only loaded for the ambiguous bars that are
+    actually asked about, and are kept in a small LRU cache.
+
+    Daily equity bars (yfinance) cover the regular session only, while the
+    fine bars (Polygon) include extended hours. Give the session so that
+    pre-market and after-hours bars are not replayed.
+    """
+
+    def __init__(self, store_root, fine_timeframe, bar_duration_ms, ticker=None, cache_size=256,
+                 session=None, session_timezone='UTC'):
+        """
+        Args:
+            store_root: Root folder of the bar store (see Bar_Store).
+            fine_timeframe: Timeframe label of the fine series, e.g. '1minute'.
+            bar_duration_ms: Duration of one coarse bar in milliseconds.
+            ticker: Default store ticker, used when resolve() gets none.
+            cache_size: Number of coarse bars whose fine bars are kept in memory.
+            session: Optional (start, end) local times like ('09:30', '16:00').
+                Only fine bars starting inside the session of the coarse bar's
+                date (its UTC calendar date, the label of a daily bar) are
+                replayed.
+            session_timezone: Time zone of the session times, e.g. 'America/New_York'.
+        """
+        self.store_root = store_root
+        self.fine_timeframe = fine_timeframe
+        self.bar_duration_ms = bar_duration_ms
+        self.ticker = ticker
+        self.cache_size = cache_size
+        self.session = None if session is None else tuple(time.fromisoformat(t) for t in session)
+        self.session_timezone = ZoneInfo(session_timezone)
+
+        self._cache = OrderedDict()
+        self.lookups = 0        # Ambiguous bars asked about
+        self.fine_bars_loaded = 0
+
+    def window(self, bar_start_ms):
+        """[start, end) in Unix milliseconds of the fine bars replayed for one coarse bar."""
+        start_ms, end_ms = bar_start_ms, bar_start_ms + self.bar_duration_ms
+        if self.session is None:
+            return start_ms, end_ms
+
+        day = datetime.fromtimestamp(bar_start_ms / 1000, tz=timezone.utc).date()
+        start_day = day
+        if self.session[1] <= self.session[0]:
+            # Session across midnight, e.g. futures, ending on the bar's date
+            start_day = day - timedelta(days=1)
+        session_start = _to_ms(datetime.combine(start_day, self.session[0], tzinfo=self.session_timezone))
+        session_end = _to_ms(datetime.combine(day, self.session[1], tzinfo=self.session_timezone))
+        if self.bar_duration_ms >= _DAY_MS:
+            # A daily (or longer) bar is labelled with its date, not its start time
+            return session_start, session_end
+        return max(start_ms, session_start), min(end_ms, session_end)
+
+    def fine_bars(self, bar_start_ms, ticker=None):
+        """Open, high and low arrays of the fine bars inside one coarse bar."""
+        ticker = ticker or self.ticker
+        key = (ticker, bar_start_ms)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        start_ms, end_ms = self.window(bar_start_ms)
+        df = read_bars(self.store_root, ticker, self.fine_timeframe,
+                       start_ts=start_ms, end_ts=end_ms - 1, columns=['o', 'h', 'l'])
+        bars = (df['o'].to_numpy(np.float64), df['h'].to_numpy(np.float64), df['l'].to_numpy(np.float64))
+        self.fine_bars_loaded += len(df)
+
+        self._cache[key] = bars
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return bars
+
+    def resolve(self, bar_start_ms, is_long, stop, target, ticker=None):
+        """
+        Returns which level was hit first inside a coarse bar.
+
+        Returns:
+            A tuple (reason, fine_open): EXIT_STOP or EXIT_TARGET and the open
+            of the fine bar that hit it, which is where a resting order fills
+            if that bar gapped through the level. (EXIT_AMBIGUOUS, NaN) when
+            the fine bars are missing or a single fine bar touches both levels
+            as well.
+        """
+        self.lookups += 1
+        opens, highs, lows = self.fine_bars(bar_start_ms, ticker)
+
+        for i in range(len(opens)):
+            reason = classify_bar(opens[i], highs[i], lows[i], is_long, stop, target)
+            if reason != EXIT_NONE:
+                return reason, opens[i]
+        return EXIT_AMBIGUOUS, np.nan
+
+
+def resolve_ambiguous_exits(resolver, bar_times_ms, direction, stop, target,
+                            exit_idx, exit_price, exit_reason, fill='next_open', ticker=None):
+    """
+    Refines the output of Exit_Simulation.simulate_exits() in place.
+
+    Only the trades that exited on an ambiguous bar are looked up. Their
+    reason is replaced by the resolved one; with the 'level' fill model the
+    exit price is moved to the level that was hit first, or to the open of
+    the fine bar that gapped through it. With 'next_open' the price stays
+    the next bar's open, as in the backtrader strategy.
+
+    Args:
+        resolver: An IntrabarResolver for the traded instrument.
+        bar_times_ms: Start time of every coarse bar in Unix milliseconds.
+        direction, stop, target: The per-trade inputs given to simulate_exits().
+        exit_idx, exit_price, exit_reason: The arrays returned by simulate_exits().
+        fill: The fill model used for simulate_exits().
+        ticker: Store ticker, defaults to the resolver's ticker.
+
+    Returns:
+        The number of trades that were resolved.
+    """
+    resolved = 0
+    for k in np.flatnonzero(exit_reason == EXIT_AMBIGUOUS):
+        # With 'next_open' the exit index is the bar after the ambiguous one
+        bar = exit_idx[k] if fill == 'level' else exit_idx[k] - 1
+        is_long = direction[k] > 0
+
+        reason, fine_open = resolver.resolve(int(bar_times_ms[bar]), is_long, stop[k], target[k], ticker)
+        if reason == EXIT_AMBIGUOUS:
+            continue
+
+        exit_reason[k] = reason
+        if fill == 'level':
+            # The fine bars can gap through a level inside the coarse bar
+            exit_price[k] = level_fill_price(fine_open, is_long, reason, stop[k], target[k])
+        resolved += 1
+    return resolved
+
+
+def resolver_from_settings(settings, ticker=None):
+    """
+    Builds a resolver from an [optimize.intrabar] / [sweep.intrabar] config table.
+
+    Args:
+        settings: Dict with 'timeframe' (fine timeframe label, e.g. '1minute')
+            and optionally 'store_folder', 'bar_duration_ms' (defaults to one
+            day, the bar size of the yfinance runs), 'session' ([start, end]
+            local times, e.g. ["09:30", "16:00"]), 'timezone' of the session,
+            'ticker' and 'cache_size'. None or an empty dict disables the
+            resolution.
+        ticker: Store ticker used when the settings name none, e.g. the symbol.
+
+    Returns:
+        An IntrabarResolver, or None without settings.
+    """
+    if not settings:
+        return None
+    if 'timeframe' not in settings:
+        raise ValueError("Intrabar settings need the 'timeframe' of the fine bars")
+    return IntrabarResolver(
+        settings.get('store_folder', os.path.join('Data', 'bars')),
+        settings['timeframe'],
+        settings.get('bar_duration_ms', _DAY_MS),
+        ticker=settings.get('ticker', ticker),
+        cache_size=settings.get('cache_size', 256),
+        session=settings.get('session'),
+        session_timezone=settings.get('timezone', 'UTC'),
+    )
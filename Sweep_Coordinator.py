@@ -0,0 +1,388 @@
+"""
+Coordinator/worker mode for parameter sweeps that don't fit on one machine.
+
+The coordinator splits the symbol x walk-forward window x parameter grid space
+into tasks and hands them out over an authenticated socket
+(multiprocessing.connection). Workers lease one task at a time, run it with
+locally cached data and send back a compact result dict. A lease that isn't
+completed in time, or whose worker disconnects, goes back into the queue
+until the task has used up its attempts.
+
+    coordinator:  python Trading_CLI.py sweep [--local-workers N]
+    workers:      python Trading_CLI.py worker --connect HOST:PORT
+
+Messages are pickled, so whoever knows the authkey can run code on the
+coordinator and on the workers. There is no built-in key: on a loopback
+address the coordinator generates a random one, any other address needs an
+explicit secret (SWEEP_AUTHKEY or [sweep].authkey).
+"""
+import ipaddress
+import itertools
+import os
+import pickle
+import secrets
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+DEFAULT_ADDRESS = ('127.0.0.1', 6000)
+CACHE_FOLDER = os.path.join('Data', 'cache')
+
+# Keys that have been published (example config, old default) and are never accepted
+PUBLIC_AUTHKEYS = {b'change-me', b'orb-sweep'}
+
+
+def is_loopback(host):
+    """True if host resolves to a loopback address."""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def check_authkey(address, authkey):
+    """
+    Validates the coordinator's shared secret.
+
+    Returns:
+        The authkey, or a random one when none is given and the coordinator
+        only listens on a loopback address.
+
+    Raises:
+        ValueError: If the key is a published one, or missing for a
+            non-loopback address.
+    """
+    if authkey in PUBLIC_AUTHKEYS:
+        raise ValueError("The sweep authkey is a published placeholder, set SWEEP_AUTHKEY "
+                         "or [sweep].authkey to a secret of your own")
+    if authkey:
+        return authkey
+    if not is_loopback(address[0]):
+        raise ValueError(f"Refusing to listen on {address[0]} without an authkey, "
+                         "set SWEEP_AUTHKEY or [sweep].authkey")
+    return secrets.token_hex(16).encode()
+
+
+def build_sweep_tasks(symbols, param_grid, windows, **task_settings):
+    """
+    Expands symbols, walk-forward windows and a parameter grid into tasks.
+
+    Args:
+        symbols: Symbols to test.
+        param_grid: Dict of strategy parameter name -> list of values.
+        windows: List of (start, end) date strings, one per walk-forward window.
+        **task_settings: Extra settings copied into every task, e.g. cash.
+
+    Returns:
+        A list of task dicts with 'symbol', 'start', 'end', 'params' and the
+        overall 'data_start' / 'data_end' range, so a worker downloads each
+        symbol once for all of its windows.
+    """
+    data_start = min(start for start, _ in windows)
+    data_end = max(end for _, end in windows)
+    names = list(param_grid)
+
+    tasks = []
+    for symbol, (start, end) in itertools.product(symbols, windows):
+        for values in itertools.product(*(param_grid[name] for name in names)):
+            tasks.append({
+                'symbol': symbol,
+                'start': start,
+                'end': end,
+                'data_start': data_start,
+                'data_end': data_end,
+                'params': dict(zip(names, values)),
+                **task_settings,
+            })
+    return tasks
+
+
+class SweepCoordinator:
+    """Serves sweep tasks to workers and collects their results."""
+
+    def __init__(self, tasks, address=DEFAULT_ADDRESS, authkey=None,
+                 lease_seconds=600, max_attempts=3):
+        """
+        authkey: Shared secret of the workers. Without one a random key is
+        generated (loopback addresses only) and printed once by run().
+        """
+        self.tasks = list(tasks)
+        self.address = address
+        self.generated_authkey = not authkey
+        self.authkey = check_authkey(address, authkey)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        self._pending = deque(range(len(self.tasks)))
+        self._leases = {}  # task id -> (worker id, lease deadline)
+        self._attempts = [0] * len(self.tasks)
+        self.results = {}  # task id -> result dict
+        self.failures = {}  # task id -> last error message
+
+        self._listener = None
+        self._all_done = threading.Event()
+
+    # --- Queue state (call with self._lock held) ---
+
+    def _finished(self):
+        return len(self.results) + len(self.failures) == len(self.tasks)
+
+    def _lease(self, worker_id):
+        while self._pending:
+            task_id = self._pending.popleft()
+            if task_id in self.results or task_id in self.failures:
+                continue
+            self._attempts[task_id] += 1
+            self._leases[task_id] = (worker_id, time.monotonic() + self.lease_seconds)
+            return task_id
+        return None
+
+    def _release(self, task_id, error):
+        """Puts a task back into the queue, or gives up after max_attempts."""
+        self._leases.pop(task_id, None)
+        if task_id in self.results or task_id in self.failures:
+            return
+        if self._attempts[task_id] >= self.max_attempts:
+            self.failures[task_id] = error
+            print(f"Task {task_id} failed {self._attempts[task_id]} times, giving up: {error}")
+        else:
+            self._pending.append(task_id)
+
+    def _complete(self, task_id, result):
+        self._leases.pop(task_id, None)
+        # A late result of an expired lease still counts, duplicates are dropped
+        if task_id not in self.results and task_id not in self.failures:
+            self.results[task_id] = result
+
+    def _reap_expired_leases(self):
+        now = time.monotonic()
+        for task_id, (worker_id, deadline) in list(self._leases.items()):
+            if deadline < now:
+                print(f"Lease of task {task_id} held by {worker_id} expired.")
+                self._release(task_id, f"lease expired on {worker_id}")
+
+    # --- Networking ---
+
+    def _serve_connection(self, conn):
+        worker_id = None
+        try:
+            while True:
+                message = conn.recv()
+                kind = message[0]
+
+                with self._lock:
+                    if kind == 'lease':
+                        worker_id = message[1]
+                        task_id = self._lease(worker_id)
+                        if task_id is not None:
+                            reply = ('task', task_id, self.tasks[task_id])
+                        elif self._finished():
+                            reply = ('stop',)
+                        else:
+                            # Everything is leased out, retry in case a lease comes back
+                            reply = ('wait', 1.0)
+                    elif kind == 'result':
+                        self._complete(message[1], message[2])
+                        reply = ('ok',)
+                    elif kind == 'failed':
+                        self._release(message[1], message[2])
+                        reply = ('ok',)
+                    else:
+                        reply = ('error', f"unknown message '{kind}'")
+
+                    if self._finished():
+                        self._all_done.set()
+
+                conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            # A worker that went away can't finish its leases
+            if worker_id is not None:
+                with self._lock:
+                    for task_id, (holder, _) in list(self._leases.items()):
+                        if holder == worker_id:
+                            self._release(task_id, f"worker {worker_id} disconnected")
+                    if self._finished():
+                        self._all_done.set()
+
+    def _accept_loop(self):
+        while not self._all_done.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Listener closed, or a client failed authentication
+                if self._all_done.is_set():
+                    return
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def run(self, poll_interval=0.5):
+        """
+        Serves tasks until every task has a result or has failed.
+
+        Returns:
+            The list of results in task order (None for failed tasks).
+        """
+        self._listener = Listener(self.address, authkey=self.authkey)
+        print(f"Coordinator listening on {self.address[0]}:{self.address[1]} "
+              f"with {len(self.tasks)} tasks.")
+        if self.generated_authkey:
+            print(f"Workers authenticate with SWEEP_AUTHKEY={self.authkey.decode()}")
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+        try:
+            with self._lock:
+                if self._finished():
+                    self._all_done.set()
+            while not self._all_done.wait(poll_interval):
+                with self._lock:
+                    self._reap_expired_leases()
+                    if self._finished():
+                        self._all_done.set()
+        finally:
+            # Also stops the accept loop when interrupted
+            self._all_done.set()
+            self._listener.close()
+
+        print(f"Sweep finished: {len(self.results)} results, {len(self.failures)} failed tasks.")
+        return [self.results.get(task_id) for task_id in range(len(self.tasks))]
+
+
+def run_worker(address, authkey, run_task=None, worker_id=None, connect_timeout=30.0):
+    """
+    Pulls tasks from a coordinator until it reports that the sweep is done.
+
+    Args:
+        address: (host, port) of the coordinator.
+        authkey: Shared secret of the coordinator.
+        run_task: Callable turning a task dict into a result dict,
+            defaults to run_orb_task().
+        worker_id: Name reported to the coordinator, defaults to host:pid.
+        connect_timeout: Seconds to keep retrying while the coordinator starts.
+
+    Returns:
+        The number of tasks this worker completed.
+    """
+    run_task = run_task or run_orb_task
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            conn = Client(address, authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+    completed = 0
+    try:
+        while True:
+            conn.send(('lease', worker_id))
+            reply = conn.recv()
+
+            if reply[0] == 'stop':
+                break
+            if reply[0] == 'wait':
+                time.sleep(reply[1])
+                continue
+
+            _, task_id, task = reply
+            try:
+                result = run_task(task)
+            except Exception:
+                conn.send(('failed', task_id, traceback.format_exc(limit=3)))
+            else:
+                conn.send(('result', task_id, result))
+                completed += 1
+            conn.recv()
+    except (EOFError, OSError):
+        # Coordinator finished and closed the connection
+        pass
+    finally:
+        conn.close()
+    return completed
+
+
+def spawn_local_workers(count, address, authkey, run_task=None):
+    """Starts worker processes on this machine, e.g. to test a sweep on localhost."""
+    import multiprocessing
+
+    workers = []
+    for _ in range(count):
+        # Default worker ids (host:pid) stay unique across several calls
+        process = multiprocessing.Process(
+            target=run_worker, args=(address, authkey, run_task), daemon=True
+        )
+        process.start()
+        workers.append(process)
+    return workers
+
+
+# --- ORB task runner ---
+
+def load_cached_data(symbol, start, end, cache_folder=CACHE_FOLDER):
+    """Daily yfinance data for a symbol, downloaded once and kept in cache_folder."""
+    os.makedirs(cache_folder, exist_ok=True)
+    filepath = os.path.join(cache_folder, f"{symbol}_{start}_{end}_1d.pkl")
+    if os.path.exists(filepath):
+        with open(filepath, 'rb') as f:
+            return pickle.load(f)
+
+    import yfinance as yf
+    df = yf.download(symbol, start=start, end=end, interval='1d')
+
+    # Write atomically so concurrent workers never read a half-written file
+    tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_filepath, 'wb') as f:
+        pickle.dump(df, f)
+    os.replace(tmp_filepath, filepath)
+    return df
+
+
+def run_orb_task(task, cache_folder=CACHE_FOLDER):
+    """Runs one OpeningRangeBreakout backtest and returns a compact result."""
+    import backtrader as bt
+    from Backtesting import make_data_feed
+    from Core_Strategy_Structure import OpeningRangeBreakout
+
+    df = load_cached_data(task['symbol'], task['data_start'], task['data_end'], cache_folder)
+    # End dates are exclusive like yf.download's, so adjacent windows don't share a day
+    df = df[(df.index >= task['start']) & (df.index < task['end'])]
+
+    params = dict(task['params'])
+    if task.get('intrabar'):
+        from Intrabar_Resolution import resolver_from_settings
+        # Fine bars come from the worker's own bar store. Fills stay at the
+        # next open, the resolver only refines the reported exit counts.
+        params['intrabar_resolver'] = resolver_from_settings(task['intrabar'], task['symbol'])
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(make_data_feed(df), name=task['symbol'])
+    cerebro.addstrategy(OpeningRangeBreakout, **params)
+    cerebro.broker.setcash(task.get('cash', 100000.0))
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+    cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
+    strat = cerebro.run()[0]
+
+    params = strat.params
+    return {
+        'symbol': task['symbol'],
+        'start': task['start'],
+        'end': task['end'],
+        'opening_bars': params.num_opening_bars,
+        'volume_threshold': params.volume_threshold,
+        'stop_multiple': params.stop_atr_multiple,
+        'profit_multiple': params.profit_atr_multiple,
+        'sharpe_ratio': strat.analyzers.sharpe.get_analysis().get('sharperatio', 0),
+        'total_return': strat.analyzers.returns.get_analysis().get('rtot', 0),
+        **{f'{reason}_exits': count for reason, count in strat.exit_counts().items()},
+    }
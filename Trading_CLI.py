@@ -0,0 +1,335 @@
+"""
+Single entry point for the data and backtesting scripts.
+
+    python Trading_CLI.py [--config config.toml] <command> [options]
+
+Commands: fetch, combine, validate, backtest, optimize, sweep, worker, events, scan.
+
+Settings come from a TOML config file (see config.example.toml), one section
+per command. Heavy libraries (backtrader, yfinance, pandas, ...) are only
+imported inside the command that needs them, so lightweight commands start
+in tens of milliseconds. Keep it that way: no heavy imports at module level.
+"""
+import argparse
+import os
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = "config.toml"
+
+
+def load_config(path: str | None) -> dict:
+    """
+    Loads the TOML config file.
+
+    A missing default config file is not an error, every setting has a
+    default in the script it belongs to.
+    """
+    config_path = path or DEFAULT_CONFIG
+    if not os.path.exists(config_path):
+        if path is not None:
+            raise SystemExit(f"Error: Config file '{config_path}' not found.")
+        return {}
+
+    import tomllib
+    with open(config_path, "rb") as f:
+        try:
+            return tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise SystemExit(f"Error: Could not parse config file '{config_path}': {e}")
+
+
+def load_script(relative_path: str, module_name: str):
+    """Imports one of the standalone scripts in the Data folder by its path."""
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def apply_settings(module, settings: dict, section: str) -> None:
+    """
+    Overrides a script's configuration constants with config values.
+
+    Config keys are the lower-case names of the constants, e.g. 'api_key'
+    sets API_KEY. Unknown keys are rejected to catch typos.
+    """
+    for key, value in settings.items():
+        name = key.upper()
+        if not hasattr(module, name):
+            raise SystemExit(f"Error: Unknown setting '{key}' in section [{section}].")
+        setattr(module, name, value)
+
+
+# --- COMMANDS ---
+
+def cmd_fetch(args, config):
+    """Downloads new bars from Polygon.io into the bar store."""
+    settings = dict(config.get("fetch", {}))
+    # Keep the API key out of the config file if preferred
+    if os.environ.get("POLYGON_API_KEY"):
+        settings["api_key"] = os.environ["POLYGON_API_KEY"]
+
+    get_data = load_script(os.path.join("Data", "PolygonIO", "getData.py"), "getData")
+    apply_settings(get_data, settings, "fetch")
+    get_data.main()
+
+
+def cmd_combine(args, config):
+    """Combines the legacy JSON data files into a single file."""
+    combine_data = load_script(os.path.join("Data", "PolygonIO", "combineData.py"), "combineData")
+    apply_settings(combine_data, config.get("combine", {}), "combine")
+    combine_data.main()
+
+
+def cmd_validate(args, config):
+    """Compares the record counts of a JSON file and a Parquet file."""
+    settings = config.get("validate", {})
+    compare = load_script(os.path.join("Data", "Analyse", "compareJsonParquet.py"), "compareJsonParquet")
+    compare.compare_file_counts(
+        json_filepath=args.json_file or settings.get("json_file"),
+        parquet_filepath=args.parquet_file or settings.get("parquet_file"),
+    )
+
+
+def cmd_backtest(args, config):
+    """Runs the portfolio ORB backtest."""
+    settings = dict(config.get("backtest", {}))
+    if args.symbols:
+        settings["symbols"] = args.symbols
+    strategy_params = settings.pop("strategy", None)
+
+    from Backtesting import run_orb_backtest
+    run_orb_backtest(strategy_params=strategy_params, **settings)
+
+
+def cmd_optimize(args, config):
+    """Runs the ORB parameter optimization."""
+    settings = dict(config.get("optimize", {}))
+    if args.symbol:
+        settings["symbol"] = args.symbol
+    if args.maxcpus:
+        settings["maxcpus"] = args.maxcpus
+    param_grid = settings.pop("grid", None)
+
+    from Backtesting import optimize_orb_parameters
+    optimize_orb_parameters(param_grid=param_grid, **settings)
+
+
+def sweep_connection(args, settings):
+    """
+    Coordinator (host, port) and authkey from the command line, env or [sweep].
+
+    The authkey is None if neither SWEEP_AUTHKEY nor [sweep].authkey is set.
+    """
+    host = settings.get("host", "127.0.0.1")
+    port = settings.get("port", 6000)
+    if getattr(args, "connect", None):
+        host, _, port = args.connect.rpartition(":")
+    authkey = os.environ.get("SWEEP_AUTHKEY") or settings.get("authkey")
+    return (host, int(port)), authkey.encode() if authkey else None
+
+
+def cmd_sweep(args, config):
+    """Coordinates a parameter sweep across worker machines."""
+    settings = config.get("sweep", {})
+    address, authkey = sweep_connection(args, settings)
+
+    from functools import partial
+    from Sweep_Coordinator import (CACHE_FOLDER, SweepCoordinator, build_sweep_tasks,
+                                   run_orb_task, spawn_local_workers)
+    param_grid = settings.get("grid")
+    if param_grid is None:
+        from Backtesting import OPTIMIZATION_GRID
+        param_grid = OPTIMIZATION_GRID
+
+    tasks = build_sweep_tasks(
+        settings.get("symbols", ["SPY"]),
+        param_grid,
+        settings.get("windows", [["2020-01-01", "2023-01-01"]]),
+        cash=settings.get("cash", 100000.0),
+        intrabar=settings.get("intrabar"),
+    )
+    try:
+        coordinator = SweepCoordinator(
+            tasks, address=address, authkey=authkey,
+            lease_seconds=settings.get("lease_seconds", 600),
+            max_attempts=settings.get("max_attempts", 3),
+        )
+    except ValueError as e:
+        raise SystemExit(f"Error: {e}")
+    if args.local_workers:
+        # Same task runner as the worker command
+        run_task = partial(run_orb_task, cache_folder=settings.get("cache_folder", CACHE_FOLDER))
+        spawn_local_workers(args.local_workers, address, coordinator.authkey, run_task)
+
+    results = [result for result in coordinator.run() if result is not None]
+
+    output_file = settings.get("output_file")
+    if output_file:
+        import json
+        with open(output_file, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Saved {len(results)} results to '{output_file}'.")
+
+    from Backtesting import print_top_combinations
+    print_top_combinations(results)
+
+
+def cmd_worker(args, config):
+    """Runs sweep tasks handed out by a coordinator."""
+    settings = config.get("sweep", {})
+    address, authkey = sweep_connection(args, settings)
+    if authkey is None:
+        raise SystemExit("Error: Set SWEEP_AUTHKEY or [sweep].authkey to the coordinator's authkey.")
+
+    from functools import partial
+    from Sweep_Coordinator import CACHE_FOLDER, run_orb_task, run_worker
+    run_task = partial(run_orb_task, cache_folder=settings.get("cache_folder", CACHE_FOLDER))
+    completed = run_worker(address, authkey, run_task)
+    print(f"Worker finished after {completed} tasks.")
+
+
+def cmd_scan(args, config):
+    """Reports recent engulfing patterns in the bar store."""
+    settings = config.get("scan", {})
+    store_folder = settings.get("store_folder", os.path.join("Data", "bars"))
+    tickers = args.tickers or settings.get("tickers", ["X:BTCUSD"])
+    timeframe = settings.get("timeframe", "5minute")
+    lookback_bars = args.lookback or settings.get("lookback_bars", 3)
+    trend_length = settings.get("trend_length", 50)
+    mintick = settings.get("mintick", 0.01)
+    cache_folder = settings.get("cache_folder")
+
+    from Bar_Store import read_bars, ticker_folder_name
+    from Trend_Filters import PINE_TIMEFRAMES, TimeframeFilterCache
+    # Timeframe name -> pandas resample rule, the stored bars are "Current"
+    timeframes = {"Current": None, **settings.get("timeframes", PINE_TIMEFRAMES)}
+
+    for ticker in tickers:
+        cache, cache_file = None, None
+        if cache_folder:
+            os.makedirs(cache_folder, exist_ok=True)
+            cache_file = os.path.join(cache_folder, f"{ticker_folder_name(ticker)}_{timeframe}_filters.pkl")
+            if os.path.exists(cache_file):
+                cache = TimeframeFilterCache.load(cache_file)
+                # A cache built for other settings can't be updated
+                if (cache.timeframes != timeframes or trend_length not in cache.trend_lengths
+                        or cache.mintick != mintick):
+                    cache = None
+
+        if cache is None:
+            cache = TimeframeFilterCache(timeframes, [trend_length], mintick)
+        # Only the bars since the last cached one, which may have been refreshed
+        cache.update(read_bars(store_folder, ticker, timeframe, start_ts=cache.last_timestamp()))
+        if not cache.bars:
+            print(f"{ticker}: no {timeframe} bars in '{store_folder}'.")
+            continue
+        if cache_file:
+            cache.save(cache_file)
+
+        for name in timeframes:
+            bullish, bearish = cache.signals(
+                name, [trend_length], [settings.get("min_engulf_percent", 0.0)],
+                use_volume_filter=settings.get("use_volume_filter", True),
+                use_trend_filter=settings.get("use_trend_filter", False),
+            )
+            # Patterns on a still-forming higher-timeframe bar aren't confirmed yet
+            confirmed = cache.confirmed_bars(name)
+            end = len(cache.bars[name]) if args.include_forming else confirmed
+            for i in range(max(end - lookback_bars, 0), end):
+                if bullish[i, 0, 0] or bearish[i, 0, 0]:
+                    status = "" if i < confirmed else " (unconfirmed)"
+                    print(f"{ticker} {name} {cache.bars[name].index[i]:%Y-%m-%d %H:%M} "
+                          f"{'Bull' if bullish[i, 0, 0] else 'Bear'} engulfing{status}")
+
+
+def cmd_events(args, config):
+    """Queries an event log written by a strategy's recorder."""
+    from datetime import datetime, timezone
+    import Event_Log
+
+    def to_ms(value):
+        if value is None:
+            return None
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp() * 1000)
+
+    event_codes = {name: code for code, name in Event_Log.EVENT_NAMES.items()}
+    events = [event_codes[name] for name in args.event] if args.event else None
+
+    log = Event_Log.EventLog(args.log)
+    shown = 0
+    for event in log.replay(symbol=args.symbol, event=events,
+                            start=to_ms(args.start), end=to_ms(args.end)):
+        if shown == args.limit:
+            print("...")
+            break
+        moment = datetime.fromtimestamp(event.ts / 1000, tz=timezone.utc)
+        print(f"{moment:%Y-%m-%d %H:%M:%S} {event.symbol} {event.event} code={event.code} "
+              f"side={event.side} price={event.price:.4f} size={event.size:g} "
+              f"value={event.value:.4f} ref={event.ref}")
+        shown += 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="Trading_CLI.py", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", help=f"TOML config file (default: {DEFAULT_CONFIG} if present)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("fetch", help=cmd_fetch.__doc__).set_defaults(func=cmd_fetch)
+    commands.add_parser("combine", help=cmd_combine.__doc__).set_defaults(func=cmd_combine)
+
+    validate = commands.add_parser("validate", help=cmd_validate.__doc__)
+    validate.add_argument("--json-file")
+    validate.add_argument("--parquet-file")
+    validate.set_defaults(func=cmd_validate)
+
+    backtest = commands.add_parser("backtest", help=cmd_backtest.__doc__)
+    backtest.add_argument("--symbols", nargs="+")
+    backtest.set_defaults(func=cmd_backtest)
+
+    optimize = commands.add_parser("optimize", help=cmd_optimize.__doc__)
+    optimize.add_argument("--symbol")
+    optimize.add_argument("--maxcpus", type=int)
+    optimize.set_defaults(func=cmd_optimize)
+
+    sweep = commands.add_parser("sweep", help=cmd_sweep.__doc__)
+    sweep.add_argument("--local-workers", type=int, default=0,
+                       help="Also start this many workers on this machine")
+    sweep.set_defaults(func=cmd_sweep)
+
+    worker = commands.add_parser("worker", help=cmd_worker.__doc__)
+    worker.add_argument("--connect", help="Coordinator address as HOST:PORT")
+    worker.set_defaults(func=cmd_worker)
+
+    events = commands.add_parser("events", help=cmd_events.__doc__)
+    events.add_argument("log", help="Path of the event log")
+    events.add_argument("--symbol", nargs="+")
+    events.add_argument("--event", nargs="+", choices=["signal", "order", "fill", "exit", "box_state"])
+    events.add_argument("--start", help="ISO date/time (UTC if no offset)")
+    events.add_argument("--end", help="ISO date/time (UTC if no offset)")
+    events.add_argument("--limit", type=int, default=100)
+    events.set_defaults(func=cmd_events)
+
+    scan = commands.add_parser("scan", help=cmd_scan.__doc__)
+    scan.add_argument("--tickers", nargs="+")
+    scan.add_argument("--lookback", type=int, help="Number of most recent bars to report on")
+    scan.add_argument("--include-forming", action="store_true",
+                      help="Also report the still-forming bar of each higher timeframe")
+    scan.set_defaults(func=cmd_scan)
+
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+    config = load_config(args.config)
+    args.func(args, config)
+
+
+if __name__ == "__main__":
+    main()
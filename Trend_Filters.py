@@ -0,0 +1,242 @@
+"""
+Higher-timeframe trend and volume filters of the Pine detect_engulfing(),
+computed once per timeframe for a whole parameter sweep.
+
+TimeframeFilterCache resamples the base bars into every timeframe the Pine
+scripts request, keeps the EMAs of all trend lengths as one 2-D array next to
+the resampled bars and updates both incrementally when new base bars arrive.
+signals() then evaluates every trend_length x min_engulf_percent combination
+with broadcasting instead of another pass over the data.
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from Engulfing_Patterns import engulfing_components
+from Exit_Simulation import njit
+
+# Timeframes of engulfing_box_strategy.pine as pandas resample rules. Bins are
+# closed and labelled on the left, so a label is the bar's open time as in Pine.
+PINE_TIMEFRAMES = {
+    '1H': '1h',
+    '4H': '4h',
+    'Daily': '1D',
+    'Weekly': 'W-MON',
+    'Monthly': 'MS',
+}
+
+AGGREGATION = {'o': 'first', 'h': 'max', 'l': 'min', 'c': 'last', 'v': 'sum'}
+
+
+@njit(cache=True)
+def _ema_batch(close, lengths, out, start):
+    """
+    Fills out[start:] with the EMAs of close for every length (one column each).
+
+    Like Pine's ta.ema, a series is NaN for its first length - 1 bars and
+    starts from the SMA of those bars. Rows before start must already hold
+    the previous values, which is what makes incremental updates cheap.
+    """
+    n_bars = close.shape[0]
+    for t in range(start, n_bars):
+        for j in range(lengths.shape[0]):
+            length = lengths[j]
+            if t < length - 1:
+                out[t, j] = np.nan
+            elif t == length - 1:
+                total = 0.0
+                for k in range(length):
+                    total += close[k]
+                out[t, j] = total / length
+            else:
+                alpha = 2.0 / (length + 1)
+                out[t, j] = alpha * close[t] + (1.0 - alpha) * out[t - 1, j]
+
+
+def ema_batch(close, lengths):
+    """EMAs of close for many lengths at once, as an array of shape (bars, lengths)."""
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    lengths = np.ascontiguousarray(lengths, dtype=np.int64)
+    out = np.empty((close.shape[0], lengths.shape[0]), dtype=np.float64)
+    _ema_batch(close, lengths, out, 0)
+    return out
+
+
+def resample_bars(bars, rule):
+    """Resamples OHLCV bars (bar store columns, UTC DatetimeIndex) into one timeframe."""
+    offset = pd.tseries.frequencies.to_offset(rule)
+    # Anchor intraday bins at the epoch so a resampled tail lines up with the full history
+    origin = 'epoch' if isinstance(offset, pd.offsets.Tick) else 'start_day'
+    columns = {name: how for name, how in AGGREGATION.items() if name in bars}
+    resampled = bars.resample(rule, closed='left', label='left', origin=origin).agg(columns)
+    return resampled.dropna(subset=['o'])
+
+
+class TimeframeFilterCache:
+    """Resampled bars, trend EMAs and engulfing components per timeframe."""
+
+    def __init__(self, timeframes=None, trend_lengths=(50,), mintick=0.01):
+        """
+        Args:
+            timeframes: Dict of timeframe name -> pandas resample rule, or
+                None for the base bars themselves. Defaults to the base bars
+                plus PINE_TIMEFRAMES.
+            trend_lengths: Every EMA length a sweep may use.
+            mintick: Symbol tick size, used by the engulfing percentage.
+        """
+        if timeframes is None:
+            timeframes = {'Current': None, **PINE_TIMEFRAMES}
+        self.timeframes = dict(timeframes)
+        self.trend_lengths = np.array(sorted(set(trend_lengths)), dtype=np.int64)
+        self.mintick = mintick
+
+        self.bars = {}        # timeframe -> resampled bars (last row may still be forming)
+        self.ema = {}         # timeframe -> array (bars, trend lengths)
+        self.components = {}  # timeframe -> engulfing_components() arrays
+        self._base_tail = None
+
+    @staticmethod
+    def _as_bars(bars):
+        """Bar store rows ('t' in ms) or a DatetimeIndex frame -> UTC indexed OHLCV."""
+        if 't' in bars:
+            bars = bars.set_index(pd.to_datetime(bars['t'], unit='ms', utc=True)).drop(columns='t')
+        return bars.sort_index()
+
+    def update(self, new_bars):
+        """
+        Adds new base bars and updates every timeframe incrementally.
+
+        Only the still-forming last bar of each timeframe and the new bars
+        are resampled, and the EMAs continue from the last complete bar. A
+        base bar that is already cached is replaced by the new copy.
+        """
+        new_bars = self._as_bars(new_bars)
+        if new_bars.empty:
+            return
+
+        if self._base_tail is None:
+            base = new_bars
+        else:
+            if new_bars.index[0] < self._base_tail.index[0]:
+                raise ValueError("New bars start before the cached tail, rebuild the cache instead")
+            base = pd.concat([self._base_tail, new_bars])
+            base = base[~base.index.duplicated(keep='last')].sort_index()
+
+        for name, rule in self.timeframes.items():
+            self._update_timeframe(name, rule, base, new_bars.index[0])
+
+        # Keep the base bars that may still change a forming higher-timeframe bar
+        cutoff = min(self.bars[name].index[-1] for name in self.timeframes)
+        self._base_tail = base[base.index >= cutoff]
+
+    def _update_timeframe(self, name, rule, base, first_new):
+        old = self.bars.get(name)
+        if old is None:
+            source, keep = base, 0
+        else:
+            # Rebuild from the last (possibly forming) bar, or the bar the new data starts in
+            tail_start = old.index[-1]
+            if first_new < tail_start:
+                tail_start = first_new if rule is None else resample_bars(base.loc[[first_new]], rule).index[0]
+            source = base[base.index >= tail_start]
+            keep = int(old.index.searchsorted(tail_start))
+
+        tail = source if rule is None else resample_bars(source, rule)
+        bars = pd.concat([old.iloc[:keep], tail]) if keep else tail
+        self.bars[name] = bars
+
+        close = np.ascontiguousarray(bars['c'].to_numpy(np.float64))
+        ema = np.empty((len(bars), len(self.trend_lengths)), dtype=np.float64)
+        if keep:
+            ema[:keep] = self.ema[name][:keep]
+        _ema_batch(close, self.trend_lengths, ema, keep)
+        self.ema[name] = ema
+
+        # A bar's engulfing components only depend on it and the bar before,
+        # so recompute from the last kept bar and drop that row again
+        start = max(keep - 1, 0)
+        volume = bars['v'].iloc[start:] if 'v' in bars else None
+        fresh = engulfing_components(bars['o'].iloc[start:], bars['c'].iloc[start:],
+                                     volume, self.mintick)
+        if keep:
+            old_parts = self.components[name]
+            fresh = {key: np.concatenate([old_parts[key][:keep], values[1:]])
+                     for key, values in fresh.items()}
+        self.components[name] = fresh
+
+    def signals(self, timeframe, trend_lengths=None, min_engulf_percents=(0.0,),
+                use_volume_filter=True, use_trend_filter=True):
+        """
+        Valid engulfing signals of one timeframe for a whole parameter grid.
+
+        Args:
+            timeframe: A timeframe name of this cache.
+            trend_lengths: EMA lengths to evaluate, defaults to all cached ones.
+            min_engulf_percents: Minimum engulfing percentages to evaluate.
+            use_volume_filter, use_trend_filter: As in the Pine inputs.
+
+        Returns:
+            A tuple of boolean arrays (valid_bullish, valid_bearish), each of
+            shape (bars, trend lengths, min engulf percents). Rows from
+            confirmed_bars(timeframe) on belong to a bar that is still
+            forming and may change.
+        """
+        parts = self.components[timeframe]
+        close = self.bars[timeframe]['c'].to_numpy(np.float64)
+
+        if trend_lengths is None:
+            columns = np.arange(len(self.trend_lengths))
+        else:
+            columns = np.searchsorted(self.trend_lengths, trend_lengths)
+            if np.any(self.trend_lengths[np.minimum(columns, len(self.trend_lengths) - 1)] != trend_lengths):
+                raise ValueError(f"Trend lengths {trend_lengths} are not all cached ({self.trend_lengths.tolist()})")
+
+        # (bars, 1, 1) base conditions shared by the whole grid
+        valid = parts['volume_up'] if use_volume_filter else np.ones(len(close), dtype=bool)
+        bullish = (parts['bullish'] & valid)[:, None, None]
+        bearish = (parts['bearish'] & valid)[:, None, None]
+
+        # (bars, 1, percents): the engulfing percentage filter
+        engulf_ok = parts['engulf_percent'][:, None, None] >= np.asarray(min_engulf_percents)[None, None, :]
+
+        if use_trend_filter:
+            # (bars, lengths, 1): reversal patterns against the EMA trend
+            ema = self.ema[timeframe][:, columns]
+            trend_down = (close[:, None] < ema)[:, :, None]
+            trend_up = (close[:, None] > ema)[:, :, None]
+            return bullish & trend_down & engulf_ok, bearish & trend_up & engulf_ok
+
+        shape = (len(close), len(columns), len(min_engulf_percents))
+        return np.broadcast_to(bullish & engulf_ok, shape), np.broadcast_to(bearish & engulf_ok, shape)
+
+    def confirmed_bars(self, timeframe):
+        """
+        Number of leading bars of a timeframe that are complete.
+
+        The last resampled bar counts as forming until a base bar of the next
+        period arrives, matching request.security() with lookahead_off.
+        """
+        n_bars = len(self.bars.get(timeframe, ()))
+        if self.timeframes[timeframe] is None:
+            return n_bars
+        return max(n_bars - 1, 0)
+
+    def last_timestamp(self):
+        """Unix millisecond timestamp of the newest base bar, None if empty."""
+        if self._base_tail is None or self._base_tail.empty:
+            return None
+        return int(self._base_tail.index[-1].timestamp() * 1000)
+
+    def save(self, filepath):
+        """Pickles the cache via a temp file and an atomic rename."""
+        tmp_filepath = f"{filepath}.tmp"
+        with open(tmp_filepath, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp_filepath, filepath)
+
+    @staticmethod
+    def load(filepath):
+        with open(filepath, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,81 @@
+"""
+Startup-time benchmark for Trading_CLI.py.
+
+Runs the lightweight entry points in fresh interpreters and fails (exit code 1)
+if their median time on top of a bare interpreter start exceeds the budget, or
+if a heavy library got imported.
+
+    python bench_cli_startup.py [--runs 20] [--budget-ms 50]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(REPO_DIR, "Trading_CLI.py")
+
+# Must not be imported just to start the CLI
+HEAVY_MODULES = ["backtrader", "yfinance", "pandas", "numpy", "numba", "pyarrow", "requests"]
+
+# Invocations that must stay fast
+CASES = [
+    ["--help"],
+    ["combine", "--help"],
+    ["validate", "--help"],
+    ["backtest", "--help"],
+]
+
+
+def time_command(command: list[str], runs: int) -> float:
+    """Median wall time in milliseconds of running a command in a fresh process."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True, cwd=REPO_DIR)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def heavy_imports() -> list[str]:
+    """Heavy modules loaded by importing the CLI and building its parser."""
+    probe = (
+        "import sys; sys.path.insert(0, %r); import Trading_CLI; Trading_CLI.build_parser(); "
+        "print(' '.join(m for m in %r if m in sys.modules))" % (REPO_DIR, HEAVY_MODULES)
+    )
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return output.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark for Trading_CLI.py")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="Allowed time on top of 'python -c pass'")
+    args = parser.parse_args()
+
+    # Interpreter startup alone, for reference
+    baseline = time_command([sys.executable, "-c", "pass"], args.runs)
+    print(f"{'python -c pass':<30} {baseline:7.1f} ms")
+
+    failed = False
+    for cli_args in CASES:
+        median_ms = time_command([sys.executable, CLI, *cli_args], args.runs)
+        overhead_ms = median_ms - baseline
+        status = "ok" if overhead_ms <= args.budget_ms else "SLOW"
+        failed |= status != "ok"
+        print(f"{' '.join(cli_args):<30} {median_ms:7.1f} ms  (+{overhead_ms:.1f} ms)  {status}")
+
+    loaded = heavy_imports()
+    if loaded:
+        failed = True
+        print(f"Heavy modules imported at startup: {', '.join(loaded)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
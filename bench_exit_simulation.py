@@ -0,0 +1,124 @@
+"""
+Parity and speed check of Exit_Simulation.simulate_exits().
+
+Runs OpeningRangeBreakout on synthetic OHLCV bars, replays its trades with
+simulate_exits(..., fill='next_open') and fails (exit code 1) unless every
+entry and exit bar and price matches the backtrader fills. Then times the
+kernel on many random trades.
+
+    python bench_exit_simulation.py [--bars 3000] [--trades 1000000]
+"""
+import argparse
+import sys
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from Core_Strategy_Structure import OpeningRangeBreakout
+from Exit_Simulation import EXIT_REASON_NAMES, atr_levels, simulate_exits
+
+
+def synthetic_bars(n_bars: int, seed: int = 1) -> pd.DataFrame:
+    """Random-walk daily OHLCV bars with gaps between close and next open."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+    open_ = close * np.exp(rng.normal(0, 0.01, n_bars))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, n_bars)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, n_bars)))
+    volume = rng.integers(1000, 5000, n_bars).astype(float)
+    return pd.DataFrame(dict(open=open_, high=high, low=low, close=close, volume=volume),
+                        index=pd.date_range('2000-01-01', periods=n_bars, freq='D'))
+
+
+class RecordingORB(OpeningRangeBreakout):
+    """OpeningRangeBreakout that keeps its signals and fills for comparison."""
+
+    def __init__(self):
+        super().__init__()
+        self.signals = []  # (signal bar, direction, stop, target)
+        self.fills = []    # (bar, price), alternating entry and exit
+
+    def set_stop_and_target(self, data, is_long, entry_price):
+        super().set_stop_and_target(data, is_long, entry_price)
+        self.signals.append((len(data) - 1, 1 if is_long else -1,
+                             self.stop_orders[data], self.target_orders[data]))
+
+    def notify_order(self, order):
+        super().notify_order(order)
+        if order.status == order.Completed:
+            self.fills.append((len(order.data) - 1, order.executed.price))
+
+
+def check_parity(df: pd.DataFrame) -> bool:
+    """Compares the backtrader fills with simulate_exits, prints mismatches."""
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(RecordingORB)
+    cerebro.broker.setcash(1e9)
+    strat = cerebro.run()[0]
+
+    signals = np.array(strat.signals)
+    entry_idx = signals[:, 0].astype(np.int64)
+    exit_idx, exit_price, exit_reason = simulate_exits(
+        df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(),
+        entry_idx, signals[:, 1], signals[:, 2], signals[:, 3], fill='next_open'
+    )
+
+    entries, exits = strat.fills[0::2], strat.fills[1::2]
+    opens = df['open'].to_numpy()
+    ok = True
+    for k, (bar, price) in enumerate(entries):
+        # backtrader's averaged fill price can differ from the open in the last bit
+        if bar != entry_idx[k] + 1 or not np.isclose(price, opens[bar], rtol=1e-12, atol=0):
+            print(f"Trade {k}: entry on bar {bar} at {price}, expected bar {entry_idx[k] + 1}")
+            ok = False
+    for k, (bar, price) in enumerate(exits):
+        if bar != exit_idx[k] or not np.isclose(price, exit_price[k], rtol=1e-12, atol=0):
+            print(f"Trade {k}: backtrader exit on bar {bar} at {price}, "
+                  f"simulate_exits bar {exit_idx[k]} at {exit_price[k]}")
+            ok = False
+    # A trade without a backtrader exit must still be open in the simulation
+    for k in range(len(exits), len(signals)):
+        if exit_idx[k] != -1:
+            print(f"Trade {k}: still open in backtrader, simulate_exits exits on bar {exit_idx[k]}")
+            ok = False
+
+    reasons = {name: int((exit_reason == code).sum()) for code, name in EXIT_REASON_NAMES.items()}
+    print(f"{len(signals)} trades, {len(exits)} exits compared with backtrader: "
+          f"{'ok' if ok else 'MISMATCH'} {reasons}")
+    return ok
+
+
+def time_kernel(df: pd.DataFrame, n_trades: int) -> float:
+    """Milliseconds simulate_exits takes for n_trades random trades (after compilation)."""
+    rng = np.random.default_rng(2)
+    close = df['close'].to_numpy()
+    entry_idx = rng.integers(0, len(df) - 50, n_trades)
+    direction = rng.choice([-1, 1], n_trades)
+    stop, target = atr_levels(close[entry_idx], close[entry_idx] * 0.02, direction)
+    prices = (df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy())
+
+    # Compile (or load the cached compilation) outside the timing
+    simulate_exits(*prices, entry_idx[:10], direction[:10], stop[:10], target[:10])
+    start = time.perf_counter()
+    simulate_exits(*prices, entry_idx, direction, stop, target)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and speed check of simulate_exits()")
+    parser.add_argument("--bars", type=int, default=3000)
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_bars(args.bars)
+    ok = check_parity(df)
+    print(f"{args.trades} trades simulated in {time_kernel(df, args.trades):.0f} ms")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Localhost check of the sweep coordinator (Sweep_Coordinator.py).
+
+Runs a sweep of dummy tasks with spawn_local_workers and fails (exit code 1)
+unless every result comes back, a task held by a worker that dies mid-task
+is leased again, and a task that keeps failing ends up in the failures.
+Prints the wall time per worker count to show how the sweep scales.
+
+    python bench_sweep.py [--tasks 80] [--task-ms 50] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+from Sweep_Coordinator import SweepCoordinator, spawn_local_workers
+
+
+def free_address() -> tuple[str, int]:
+    """A loopback address with a currently unused port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()
+
+
+def dummy_task(task: dict) -> dict:
+    """Sleeps for the task's duration, raises for tasks marked as failing."""
+    if task.get("fail"):
+        raise RuntimeError(f"task {task['id']} always fails")
+    time.sleep(task["seconds"])
+    return {"id": task["id"]}
+
+
+def crashing_task(task: dict) -> dict:
+    """Dies halfway through the first task, like a worker machine going down."""
+    time.sleep(task["seconds"] / 2)
+    os._exit(1)
+
+
+def run_sweep(tasks: list[dict], workers: int, crashing_workers: int = 0,
+              max_attempts: int = 3) -> tuple[SweepCoordinator, list, float]:
+    """Runs tasks on local workers, returns the coordinator, the results and the wall time."""
+    address = free_address()
+    coordinator = SweepCoordinator(tasks, address=address, max_attempts=max_attempts)
+
+    start = time.perf_counter()
+    processes = spawn_local_workers(crashing_workers, address, coordinator.authkey, crashing_task)
+    if crashing_workers:
+        # Let the crashing workers lease their tasks first
+        time.sleep(0.3)
+    processes += spawn_local_workers(workers, address, coordinator.authkey, dummy_task)
+    results = coordinator.run(poll_interval=0.05)
+    elapsed = time.perf_counter() - start
+
+    for process in processes:
+        process.join(timeout=5)
+    return coordinator, results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Localhost check of the sweep coordinator")
+    parser.add_argument("--tasks", type=int, default=80)
+    parser.add_argument("--task-ms", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    seconds = args.task_ms / 1000
+    failed = False
+
+    # Scaling: every result has to come back
+    timings = {}
+    for count in args.workers:
+        tasks = [{"id": i, "seconds": seconds} for i in range(args.tasks)]
+        coordinator, results, elapsed = run_sweep(tasks, count)
+        complete = [result["id"] for result in results if result] == list(range(args.tasks))
+        failed |= not complete
+        timings[count] = elapsed
+        speedup = timings[args.workers[0]] / elapsed * args.workers[0]
+        print(f"{count:>2} workers  {elapsed:6.2f} s  (x{speedup:.1f})  "
+              f"{'ok' if complete else 'MISSING RESULTS'}")
+
+    # Failure handling: one worker dies mid-task, two tasks always fail
+    tasks = [{"id": i, "seconds": seconds, "fail": i in (5, 17)} for i in range(40)]
+    coordinator, results, _ = run_sweep(tasks, 3, crashing_workers=1)
+    leased_again = [i for i in coordinator.results if coordinator._attempts[i] > 1]
+
+    checks = {
+        "every other task has a result": sorted(coordinator.results) == [i for i in range(40) if i not in (5, 17)],
+        "failing tasks end up in failures": sorted(coordinator.failures) == [5, 17],
+        "task of the crashed worker is leased again": len(leased_again) > 0,
+    }
+    for name, ok in checks.items():
+        failed |= not ok
+        print(f"{name:<45} {'ok' if ok else 'FAILED'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()